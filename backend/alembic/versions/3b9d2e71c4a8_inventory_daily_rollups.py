@@ -0,0 +1,46 @@
+"""inventory daily rollups
+
+Revision ID: 3b9d2e71c4a8
+Revises: ce0e3a0057e5
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d2e71c4a8'
+down_revision: Union[str, Sequence[str], None] = 'ce0e3a0057e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('inventory_daily_rollups',
+    sa.Column('ingredient_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('consumed', sa.Numeric(precision=14, scale=3), server_default='0', nullable=False),
+    sa.Column('received', sa.Numeric(precision=14, scale=3), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['ingredient_id'], ['ingredients.id'], ),
+    sa.PrimaryKeyConstraint('ingredient_id', 'day')
+    )
+
+    # backfill из уже накопленных движений
+    op.execute(
+        """
+        INSERT INTO inventory_daily_rollups (ingredient_id, day, consumed, received)
+        SELECT ingredient_id,
+               created_at::date,
+               SUM(CASE WHEN qty_delta < 0 THEN -qty_delta ELSE 0 END),
+               SUM(CASE WHEN qty_delta > 0 THEN qty_delta ELSE 0 END)
+        FROM inventory_movements
+        GROUP BY ingredient_id, created_at::date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('inventory_daily_rollups')
@@ -0,0 +1,43 @@
+"""receipts applied_at
+
+Revision ID: 5e0a7c3d9b14
+Revises: c72e5a9b1d03
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e0a7c3d9b14'
+down_revision: Union[str, Sequence[str], None] = 'c72e5a9b1d03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('receipts', sa.Column('applied_at', sa.TIMESTAMP(), nullable=True))
+
+    # backfill для применённых чеков: последний apply = самые поздние списания чека.
+    # Старые компенсации писались с source_receipt_id=NULL и сюда не попадают,
+    # а apply пишет все движения одной транзакцией — created_at у них общий
+    op.execute(
+        """
+        UPDATE receipts r
+        SET applied_at = m.last_apply
+        FROM (
+            SELECT source_receipt_id, MAX(created_at) AS last_apply
+            FROM inventory_movements
+            WHERE source_receipt_id IS NOT NULL AND qty_delta < 0
+            GROUP BY source_receipt_id
+        ) m
+        WHERE m.source_receipt_id = r.id AND r.status = 'applied'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('receipts', 'applied_at')
@@ -0,0 +1,36 @@
+"""movement keyset indexes
+
+Revision ID: 8f41c0d6a2e5
+Revises: 3b9d2e71c4a8
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f41c0d6a2e5'
+down_revision: Union[str, Sequence[str], None] = '3b9d2e71c4a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_inventory_movements_created_at_id', 'inventory_movements', ['created_at', 'id'], unique=False)
+    # старый индекс по source_receipt_id — префикс нового, больше не нужен
+    op.create_index(
+        'ix_inventory_movements_source_receipt_id_created_at_id',
+        'inventory_movements',
+        ['source_receipt_id', 'created_at', 'id'],
+        unique=False,
+    )
+    op.drop_index('ix_inventory_movements_source_receipt_id', table_name='inventory_movements')
+
+
+def downgrade() -> None:
+    op.create_index('ix_inventory_movements_source_receipt_id', 'inventory_movements', ['source_receipt_id'], unique=False)
+    op.drop_index('ix_inventory_movements_source_receipt_id_created_at_id', table_name='inventory_movements')
+    op.drop_index('ix_inventory_movements_created_at_id', table_name='inventory_movements')
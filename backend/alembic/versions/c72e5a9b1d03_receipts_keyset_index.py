@@ -0,0 +1,28 @@
+"""receipts keyset index
+
+Revision ID: c72e5a9b1d03
+Revises: 8f41c0d6a2e5
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c72e5a9b1d03'
+down_revision: Union[str, Sequence[str], None] = '8f41c0d6a2e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_receipts_user_id_created_at_id', 'receipts', ['user_id', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_receipts_user_id_created_at', table_name='receipts')
+
+
+def downgrade() -> None:
+    op.create_index('ix_receipts_user_id_created_at', 'receipts', ['user_id', 'created_at'], unique=False)
+    op.drop_index('ix_receipts_user_id_created_at_id', table_name='receipts')
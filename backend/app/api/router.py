@@ -1,5 +1,7 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
+from app.core.auth import require_role
+from app.db.session import pools_status
 from app.api.routes.auth import router as auth_router
 from app.api.routes.me import router as me_router
 from app.api.routes.ingredients import router as ingredients_router
@@ -12,6 +14,8 @@ from app.api.routes.reports import router as reports_router
 from app.api.routes.users import router as users_router
 from app.api.routes.apply import router as apply_router
 from app.api.routes.rollback import router as rollback_router
+from app.api.routes.auto_match import router as auto_match_router
+from app.api.routes.metrics import router as metrics_router
 
 router = APIRouter()
 
@@ -19,6 +23,11 @@ router = APIRouter()
 def health():
     return {"status": "ok"}
 
+
+@router.get("/health/pool", dependencies=[Depends(require_role("admin"))])
+def health_pool():
+    return pools_status()
+
 router.include_router(auth_router)
 router.include_router(me_router)
 router.include_router(ingredients_router)
@@ -27,7 +36,9 @@ router.include_router(recipes_router)
 router.include_router(inventory_router)
 router.include_router(receipts_router)
 router.include_router(receipt_items_router)
+router.include_router(auto_match_router)
 router.include_router(apply_router)
 router.include_router(rollback_router)
 router.include_router(reports_router)
-router.include_router(users_router)
\ No newline at end of file
+router.include_router(users_router)
+router.include_router(metrics_router)
\ No newline at end of file
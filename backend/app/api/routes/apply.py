@@ -1,16 +1,32 @@
 from fastapi import APIRouter, Depends
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import get_current_user
-from app.core.deps import get_db
+from app.core.deps import get_async_db
+from app.db.uow import unit_of_work
 from app.models.user import User
-from app.schemas.receipt import ReceiptOut
-from app.services.apply import apply_receipt
+from app.schemas.receipt import ReceiptApplyBatchIn, ReceiptApplyBatchOut, ReceiptApplyError, ReceiptOut
+from app.services.apply import apply_receipt, apply_receipts
 
 router = APIRouter(prefix="/receipts", tags=["apply"])
 
 
 @router.post("/{receipt_id}/apply", response_model=ReceiptOut)
-def apply(receipt_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return apply_receipt(db, receipt_id=receipt_id, user_id=user.id)
+async def apply(receipt_id: int, db: AsyncSession = Depends(get_async_db), user: User = Depends(get_current_user)):
+    async with unit_of_work(db, "apply"):
+        return await apply_receipt(db, receipt_id=receipt_id, user_id=user.id)
+
+
+@router.post("/apply-batch", response_model=ReceiptApplyBatchOut)
+async def apply_batch(
+    payload: ReceiptApplyBatchIn,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user),
+):
+    async with unit_of_work(db, "apply_batch"):
+        applied, errors = await apply_receipts(db, receipt_ids=payload.receipt_ids, user_id=user.id)
+    return ReceiptApplyBatchOut(
+        applied=[ReceiptOut.model_validate(r) for r in applied],
+        errors=[ReceiptApplyError(receipt_id=rid, detail=detail) for rid, detail in errors.items()],
+    )
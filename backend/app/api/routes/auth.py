@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
+from app.core.auth import invalidate_user
 from app.core.deps import get_db
 from app.core.security import create_access_token
 from app.models.user import User
@@ -23,6 +24,7 @@ def auth_telegram(payload: TelegramAuthIn, db: Session = Depends(get_db)):
         user.username = payload.username
         db.add(user)
         db.commit()
+        invalidate_user(user.id)
         db.refresh(user)
 
     token = create_access_token(sub=str(user.id), role=str(user.role.value))
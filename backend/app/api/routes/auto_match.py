@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.auth import get_current_user
+from app.core.deps import get_async_db
+from app.db.uow import unit_of_work
+from app.models.user import User
+from app.schemas.receipt_item import ReceiptItemOut
+from app.services.auto_match import auto_match_receipt
+
+router = APIRouter(prefix="/receipts", tags=["auto_match"])
+
+
+@router.post("/{receipt_id}/auto-match", response_model=list[ReceiptItemOut])
+async def auto_match(receipt_id: int, db: AsyncSession = Depends(get_async_db), user: User = Depends(get_current_user)):
+    async with unit_of_work(db, "auto_match"):
+        return await auto_match_receipt(db, receipt_id=receipt_id, user_id=user.id)
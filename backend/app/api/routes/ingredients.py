@@ -1,26 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.core.auth import require_role
+from app.core.auth import require_role_sync
 from app.core.deps import get_db
+from app.core.http_cache import json_with_etag
 from app.models import Inventory
 from app.models.ingredient import Ingredient
 from app.schemas.ingredient import IngredientCreate, IngredientOut, IngredientUpdate
+from app.services import catalog
 
 router = APIRouter(prefix="/ingredients", tags=["ingredients"])
 
 
 @router.get("", response_model=list[IngredientOut])
-def list_ingredients(db: Session = Depends(get_db)):
-    return db.query(Ingredient).order_by(Ingredient.id.asc()).all()
+def list_ingredients(request: Request, db: Session = Depends(get_db)):
+    return json_with_etag(request, *catalog.ingredients_json(db))
 
 
 @router.post(
     "",
     response_model=IngredientOut,
     status_code=status.HTTP_201_CREATED,
-    dependencies=[Depends(require_role("admin"))],
+    dependencies=[Depends(require_role_sync("admin"))],
 )
 def create_ingredient(payload: IngredientCreate, db: Session = Depends(get_db)):
     ing = Ingredient(name=payload.name.strip())
@@ -35,6 +37,7 @@ def create_ingredient(payload: IngredientCreate, db: Session = Depends(get_db)):
             status_code=status.HTTP_409_CONFLICT,
             detail={"error": "conflict", "message": "ingredient name must be unique"},
         )
+    catalog.bump("ingredients")
     db.refresh(ing)
     return ing
 
@@ -42,7 +45,7 @@ def create_ingredient(payload: IngredientCreate, db: Session = Depends(get_db)):
 @router.patch(
     "/{ingredient_id}",
     response_model=IngredientOut,
-    dependencies=[Depends(require_role("admin"))],
+    dependencies=[Depends(require_role_sync("admin"))],
 )
 def update_ingredient(ingredient_id: int, payload: IngredientUpdate, db: Session = Depends(get_db)):
     ing = db.get(Ingredient, ingredient_id)
@@ -61,6 +64,7 @@ def update_ingredient(ingredient_id: int, payload: IngredientUpdate, db: Session
             status_code=status.HTTP_409_CONFLICT,
             detail={"error": "conflict", "message": "ingredient name must be unique"},
         )
+    catalog.bump("ingredients")
     db.refresh(ing)
     return ing
 
@@ -68,7 +72,7 @@ def update_ingredient(ingredient_id: int, payload: IngredientUpdate, db: Session
 @router.delete(
     "/{ingredient_id}",
     status_code=status.HTTP_204_NO_CONTENT,
-    dependencies=[Depends(require_role("admin"))],
+    dependencies=[Depends(require_role_sync("admin"))],
 )
 def delete_ingredient(ingredient_id: int, db: Session = Depends(get_db)):
     ing = db.get(Ingredient, ingredient_id)
@@ -84,4 +88,5 @@ def delete_ingredient(ingredient_id: int, db: Session = Depends(get_db)):
             status_code=status.HTTP_409_CONFLICT,
             detail={"error": "conflict", "message": "ingredient is referenced and cannot be deleted"},
         )
+    catalog.bump("ingredients")
     return None
@@ -1,54 +1,34 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from decimal import Decimal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import get_current_user, require_role
-from app.core.deps import get_db
+from app.core.config import settings
+from app.core.deps import get_async_db
+from app.core.pagination import decode_cursor, encode_cursor
+from app.db.session import AsyncSessionLocal
+from app.db.uow import unit_of_work
 from app.models.inventory import Inventory
 from app.models.inventory_movement import InventoryMovement
 from app.models.ingredient import Ingredient
 from app.models.user import User
 from app.schemas.inventory import InventoryOut, InventoryUpdate
-from app.schemas.movement import MovementCreate, MovementOut
+from app.schemas.movement import MovementCreate, MovementOut, MovementPage
+from app.services.rollups import record_movements
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
+EXPORT_CHUNK = 1000
 
-@router.get("", response_model=list[InventoryOut])
-def list_inventory(db: Session = Depends(get_db)):
-    return db.query(Inventory).order_by(Inventory.ingredient_id.asc()).all()
-
-
-@router.get("/{ingredient_id}", response_model=InventoryOut)
-def get_inventory(ingredient_id: int, db: Session = Depends(get_db)):
-    inv = db.get(Inventory, ingredient_id)
-    if not inv:
-        raise HTTPException(404, detail={"error": "not_found", "message": "inventory row not found"})
-    return inv
-
-
-@router.patch(
-    "/{ingredient_id}",
-    response_model=InventoryOut,
-    dependencies=[Depends(require_role("admin"))],
-)
-def patch_inventory(ingredient_id: int, payload: InventoryUpdate, db: Session = Depends(get_db)):
-    inv = db.get(Inventory, ingredient_id)
-    if not inv:
-        raise HTTPException(404, detail={"error": "not_found", "message": "inventory row not found"})
-
-    if payload.min_qty is not None:
-        inv.min_qty = payload.min_qty
-    if payload.purchase_price is not None:
-        inv.purchase_price = payload.purchase_price
-    if payload.purchase_pack_qty is not None:
-        inv.purchase_pack_qty = payload.purchase_pack_qty
 
-    db.add(inv)
-    db.commit()
-    db.refresh(inv)
-    return inv
+@router.get("", response_model=list[InventoryOut])
+async def list_inventory(db: AsyncSession = Depends(get_async_db)):
+    res = await db.execute(select(Inventory).order_by(Inventory.ingredient_id.asc()))
+    return res.scalars().all()
 
 
 @router.post(
@@ -56,48 +36,47 @@ def patch_inventory(ingredient_id: int, payload: InventoryUpdate, db: Session =
     response_model=MovementOut,
     status_code=status.HTTP_201_CREATED,
 )
-def create_movement(
+async def create_movement(
     payload: MovementCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
     # operator/admin allowed by current_user (оба имеют токен)
-    ing = db.get(Ingredient, payload.ingredient_id)
-    if not ing:
-        raise HTTPException(404, detail={"error": "not_found", "message": "ingredient not found"})
-
-    # inventory row must exist
-    inv = db.get(Inventory, payload.ingredient_id)
-    if not inv:
-        raise HTTPException(409, detail={"error": "conflict", "message": "inventory row missing for ingredient"})
-
-    with db.begin():
+    async with unit_of_work(db, "create_movement"):
+        ing = await db.get(Ingredient, payload.ingredient_id)
+        if not ing:
+            raise HTTPException(404, detail={"error": "not_found", "message": "ingredient not found"})
+
+        # inventory row must exist; лочим её до изменения on_hand
+        inv = await db.get(Inventory, payload.ingredient_id, with_for_update=True)
+        if not inv:
+            raise HTTPException(409, detail={"error": "conflict", "message": "inventory row missing for ingredient"})
+
+        # on_hand_qty — Numeric(12,3) -> Decimal; float к нему не прибавить
+        qty_delta = Decimal(str(payload.qty_delta))
         mv = InventoryMovement(
             ingredient_id=payload.ingredient_id,
-            qty_delta=payload.qty_delta,
+            qty_delta=qty_delta,
             source_receipt_id=payload.source_receipt_id,
             created_by=user.id,
         )
         db.add(mv)
 
         # update on_hand
-        inv.on_hand_qty = inv.on_hand_qty + payload.qty_delta
+        inv.on_hand_qty = inv.on_hand_qty + qty_delta
         db.add(inv)
 
-    db.refresh(mv)
+        await db.flush()
+        # id/created_at дочитываем в той же транзакции — после commit второго round trip нет
+        await db.refresh(mv)
+        await record_movements(db, [mv.id])
+
     return mv
 
 
-@router.get("/movements", response_model=list[MovementOut])
-def list_movements(
-    from_: str | None = None,
-    to: str | None = None,
-    ingredient_id: int | None = None,
-    source_receipt_id: int | None = None,
-    db: Session = Depends(get_db),
-):
-    q = db.query(InventoryMovement)
-
+def _movement_filters(
+    from_: str | None, to: str | None, ingredient_id: int | None, source_receipt_id: int | None
+) -> list:
     filters = []
     if ingredient_id is not None:
         filters.append(InventoryMovement.ingredient_id == ingredient_id)
@@ -111,8 +90,91 @@ def list_movements(
     if to is not None:
         dt_to = datetime.fromisoformat(to)
         filters.append(InventoryMovement.created_at <= dt_to)
+    return filters
+
 
+@router.get("/movements", response_model=MovementPage)
+async def list_movements(
+    from_: str | None = None,
+    to: str | None = None,
+    ingredient_id: int | None = None,
+    source_receipt_id: int | None = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    filters = _movement_filters(from_, to, ingredient_id, source_receipt_id)
+    if cursor is not None:
+        c_ts, c_id = decode_cursor(cursor)
+        filters.append(tuple_(InventoryMovement.created_at, InventoryMovement.id) < tuple_(c_ts, c_id))
+
+    q = select(InventoryMovement)
     if filters:
-        q = q.filter(and_(*filters))
+        q = q.where(and_(*filters))
+
+    # limit + 1 — чтобы понять, есть ли следующая страница, без COUNT
+    res = await db.execute(
+        q.order_by(InventoryMovement.created_at.desc(), InventoryMovement.id.desc()).limit(limit + 1)
+    )
+    rows = res.scalars().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return MovementPage(items=[MovementOut.model_validate(m) for m in rows], next_cursor=next_cursor)
+
+
+@router.get("/movements/export", dependencies=[Depends(get_current_user)])
+async def export_movements(
+    from_: str | None = None,
+    to: str | None = None,
+    ingredient_id: int | None = None,
+    source_receipt_id: int | None = None,
+):
+    """Полная выгрузка в NDJSON: серверный курсор, в памяти только текущая пачка строк."""
+    filters = _movement_filters(from_, to, ingredient_id, source_receipt_id)
+    q = select(InventoryMovement)
+    if filters:
+        q = q.where(and_(*filters))
+    q = q.order_by(InventoryMovement.created_at.desc(), InventoryMovement.id.desc())
+
+    async def rows():
+        # своя сессия: живёт ровно столько, сколько отдаётся ответ
+        async with AsyncSessionLocal() as db:
+            res = await db.stream(q.execution_options(yield_per=EXPORT_CHUNK))
+            async for part in res.scalars().partitions():
+                yield "".join(MovementOut.model_validate(m).model_dump_json() + "\n" for m in part)
+                db.expunge_all()
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@router.get("/{ingredient_id}", response_model=InventoryOut)
+async def get_inventory(ingredient_id: int, db: AsyncSession = Depends(get_async_db)):
+    inv = await db.get(Inventory, ingredient_id)
+    if not inv:
+        raise HTTPException(404, detail={"error": "not_found", "message": "inventory row not found"})
+    return inv
+
+
+@router.patch(
+    "/{ingredient_id}",
+    response_model=InventoryOut,
+    dependencies=[Depends(require_role("admin"))],
+)
+async def patch_inventory(ingredient_id: int, payload: InventoryUpdate, db: AsyncSession = Depends(get_async_db)):
+    inv = await db.get(Inventory, ingredient_id)
+    if not inv:
+        raise HTTPException(404, detail={"error": "not_found", "message": "inventory row not found"})
 
-    return q.order_by(InventoryMovement.created_at.desc()).all()
+    if payload.min_qty is not None:
+        inv.min_qty = payload.min_qty
+    if payload.purchase_price is not None:
+        inv.purchase_price = payload.purchase_price
+    if payload.purchase_pack_qty is not None:
+        inv.purchase_pack_qty = payload.purchase_pack_qty
+
+    db.add(inv)
+    await db.commit()
+    await db.refresh(inv)
+    return inv
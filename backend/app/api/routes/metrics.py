@@ -0,0 +1,58 @@
+import redis
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
+from app.core.redis_client import get_redis
+from app.db.session import pools_status
+from app.services import ocr_cache, ocr_metrics
+from app.services.ocr_queue import PENDING_KEY, PROCESSING_KEY
+
+router = APIRouter(tags=["metrics"])
+
+# списки брокера Celery в Redis называются как очереди
+QUEUES = {"ocr": "ocr", "default": "default", "ocr_pending": PENDING_KEY, "ocr_processing": PROCESSING_KEY}
+
+
+def _gauge(name: str, doc: str, rows: list[tuple[str, float]]) -> list[str]:
+    return [f"# HELP {name} {doc}", f"# TYPE {name} gauge"] + [f"{name}{labels} {v}" for labels, v in rows]
+
+
+def _queue_lines() -> list[str]:
+    try:
+        p = get_redis().pipeline(transaction=False)
+        for key in QUEUES.values():
+            p.llen(key)
+        depths = p.execute()
+        cache = ocr_cache.stats()
+    except redis.RedisError:
+        return []
+    lines = _gauge("ocr_queue_depth", "Jobs waiting in queue", [
+        (f'{{queue="{q}"}}', d) for q, d in zip(QUEUES, depths)
+    ])
+    lines += [
+        "# HELP ocr_cache_requests_total OCR result cache lookups",
+        "# TYPE ocr_cache_requests_total counter",
+        f'ocr_cache_requests_total{{result="hit"}} {cache["hits"]}',
+        f'ocr_cache_requests_total{{result="miss"}} {cache["misses"]}',
+    ]
+    lines += _gauge("ocr_cache_entries", "Entries in OCR result cache", [("", cache["entries"])])
+    return lines
+
+
+def _pool_lines() -> list[str]:
+    rows: dict[str, list[tuple[str, float]]] = {}
+    for engine, st in pools_status().items():
+        for k in ("size", "checked_out", "overflow", "checkouts", "timeouts", "wait_ms_avg", "wait_ms_max"):
+            if k in st:
+                rows.setdefault(k, []).append((f'{{engine="{engine}"}}', st[k]))
+    lines: list[str] = []
+    for k, vals in rows.items():
+        lines += _gauge(f"db_pool_{k}", f"DB pool {k.replace('_', ' ')}", vals)
+    return lines
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    body = metrics.render(_queue_lines() + ocr_metrics.collect() + _pool_lines())
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
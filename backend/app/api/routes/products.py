@@ -1,25 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.core.auth import require_role
+from app.core.auth import require_role_sync
 from app.core.deps import get_db
+from app.core.http_cache import json_with_etag
 from app.models.product import Product
+from app.services import catalog
 from app.schemas.product import ProductCreate, ProductOut, ProductUpdate
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
 @router.get("", response_model=list[ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    return db.query(Product).order_by(Product.id.asc()).all()
+def list_products(request: Request, db: Session = Depends(get_db)):
+    return json_with_etag(request, *catalog.products_json(db))
 
 
 @router.post(
     "",
     response_model=ProductOut,
     status_code=status.HTTP_201_CREATED,
-    dependencies=[Depends(require_role("admin"))],
+    dependencies=[Depends(require_role_sync("admin"))],
 )
 def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
     p = Product(code=payload.code.strip(), name=payload.name)
@@ -32,6 +34,7 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
             status_code=409,
             detail={"error": "conflict", "message": "product code must be unique"},
         )
+    catalog.bump("products")
     db.refresh(p)
     return p
 
@@ -39,7 +42,7 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
 @router.patch(
     "/{product_id}",
     response_model=ProductOut,
-    dependencies=[Depends(require_role("admin"))],
+    dependencies=[Depends(require_role_sync("admin"))],
 )
 def update_product(product_id: int, payload: ProductUpdate, db: Session = Depends(get_db)):
     p = db.get(Product, product_id)
@@ -60,6 +63,7 @@ def update_product(product_id: int, payload: ProductUpdate, db: Session = Depend
             status_code=409,
             detail={"error": "conflict", "message": "product code must be unique"},
         )
+    catalog.bump("products")
     db.refresh(p)
     return p
 
@@ -67,7 +71,7 @@ def update_product(product_id: int, payload: ProductUpdate, db: Session = Depend
 @router.delete(
     "/{product_id}",
     status_code=status.HTTP_204_NO_CONTENT,
-    dependencies=[Depends(require_role("admin"))],
+    dependencies=[Depends(require_role_sync("admin"))],
 )
 def delete_product(product_id: int, db: Session = Depends(get_db)):
     p = db.get(Product, product_id)
@@ -82,4 +86,5 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
             status_code=409,
             detail={"error": "conflict", "message": "product is referenced and cannot be deleted"},
         )
+    catalog.bump("products")
     return None
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import get_current_user
-from app.core.deps import get_db
+from app.core.deps import get_async_db
 from app.models.enums import ReceiptStatus
 from app.models.product import Product
 from app.models.receipt import Receipt
@@ -14,8 +15,8 @@ from app.schemas.receipt_item import ReceiptItemCreate, ReceiptItemOut, ReceiptI
 router = APIRouter(prefix="/receipts/{receipt_id}/items", tags=["receipt_items"])
 
 
-def _get_owned_receipt(db: Session, receipt_id: int, user_id: int) -> Receipt:
-    r = db.get(Receipt, receipt_id)
+async def _get_owned_receipt(db: AsyncSession, receipt_id: int, user_id: int) -> Receipt:
+    r = await db.get(Receipt, receipt_id)
     if not r:
         raise HTTPException(404, detail={"error": "not_found", "message": "receipt not found"})
     if r.user_id != user_id:
@@ -29,28 +30,28 @@ def _ensure_editable(r: Receipt):
 
 
 @router.get("", response_model=list[ReceiptItemOut])
-def list_items(
+async def list_items(
     receipt_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    _ = _get_owned_receipt(db, receipt_id, user.id)
-    return (
-        db.query(ReceiptItem)
-        .filter(ReceiptItem.receipt_id == receipt_id)
+    _ = await _get_owned_receipt(db, receipt_id, user.id)
+    res = await db.execute(
+        select(ReceiptItem)
+        .where(ReceiptItem.receipt_id == receipt_id)
         .order_by(ReceiptItem.id.asc())
-        .all()
     )
+    return res.scalars().all()
 
 
 @router.post("", response_model=ReceiptItemOut, status_code=status.HTTP_201_CREATED)
-def create_item(
+async def create_item(
     receipt_id: int,
     payload: ReceiptItemCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    r = _get_owned_receipt(db, receipt_id, user.id)
+    r = await _get_owned_receipt(db, receipt_id, user.id)
     _ensure_editable(r)
 
     it = ReceiptItem(
@@ -68,23 +69,23 @@ def create_item(
         r.status = ReceiptStatus.edited
         db.add(r)
 
-    db.commit()
-    db.refresh(it)
+    await db.commit()
+    await db.refresh(it)
     return it
 
 
 @router.patch("/{item_id}", response_model=ReceiptItemOut)
-def patch_item(
+async def patch_item(
     receipt_id: int,
     item_id: int,
     payload: ReceiptItemUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    r = _get_owned_receipt(db, receipt_id, user.id)
+    r = await _get_owned_receipt(db, receipt_id, user.id)
     _ensure_editable(r)
 
-    it = db.get(ReceiptItem, item_id)
+    it = await db.get(ReceiptItem, item_id)
     if not it or it.receipt_id != receipt_id:
         raise HTTPException(404, detail={"error": "not_found", "message": "item not found"})
     if it.is_deleted:
@@ -107,22 +108,22 @@ def patch_item(
         db.add(r)
 
     db.add(it)
-    db.commit()
-    db.refresh(it)
+    await db.commit()
+    await db.refresh(it)
     return it
 
 
 @router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_item(
+async def delete_item(
     receipt_id: int,
     item_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    r = _get_owned_receipt(db, receipt_id, user.id)
+    r = await _get_owned_receipt(db, receipt_id, user.id)
     _ensure_editable(r)
 
-    it = db.get(ReceiptItem, item_id)
+    it = await db.get(ReceiptItem, item_id)
     if not it or it.receipt_id != receipt_id:
         raise HTTPException(404, detail={"error": "not_found", "message": "item not found"})
 
@@ -133,28 +134,28 @@ def delete_item(
         r.status = ReceiptStatus.edited
         db.add(r)
 
-    db.commit()
+    await db.commit()
     return None
 
 
 @router.post("/{item_id}/match", response_model=ReceiptItemOut)
-def match_item(
+async def match_item(
     receipt_id: int,
     item_id: int,
     payload: MatchIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    r = _get_owned_receipt(db, receipt_id, user.id)
+    r = await _get_owned_receipt(db, receipt_id, user.id)
     _ensure_editable(r)
 
-    it = db.get(ReceiptItem, item_id)
+    it = await db.get(ReceiptItem, item_id)
     if not it or it.receipt_id != receipt_id:
         raise HTTPException(404, detail={"error": "not_found", "message": "item not found"})
     if it.is_deleted:
         raise HTTPException(409, detail={"error": "conflict", "message": "item is deleted"})
 
-    p = db.get(Product, payload.product_id)
+    p = await db.get(Product, payload.product_id)
     if not p:
         raise HTTPException(404, detail={"error": "not_found", "message": "product not found"})
 
@@ -165,6 +166,6 @@ def match_item(
         db.add(r)
 
     db.add(it)
-    db.commit()
-    db.refresh(it)
+    await db.commit()
+    await db.refresh(it)
     return it
@@ -1,40 +1,49 @@
 import uuid
 from datetime import datetime
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from sqlalchemy import and_, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from app.core.auth import get_current_user
-from app.core.deps import get_db
+from app.core.config import settings
+from app.core.deps import get_async_db
+from app.core.http_cache import etag_for, json_with_etag
+from app.core.pagination import decode_cursor, encode_cursor
 from app.models.enums import ReceiptStatus
+from app.models.product import Product
 from app.models.receipt import Receipt
+from app.models.receipt_item import ReceiptItem
 from app.models.user import User
-from app.schemas.receipt import ReceiptCreateOut, ReceiptOut
-from app.services.storage import put_object
-from app.tasks.ocr_tasks import ocr_process_receipt
+from app.schemas.receipt import (
+    ReceiptCreateOut, ReceiptFullOut, ReceiptItemFullOut, ReceiptListItem, ReceiptOut, ReceiptPage,
+)
+from app.schemas.receipt_item import ReceiptItemOut
+from app.services import ocr_events, ocr_queue
+from app.services.storage import ObjectTooLarge, delete_object, put_stream
 
 router = APIRouter(prefix="/receipts", tags=["receipts"])
 
 
 @router.post("", response_model=ReceiptCreateOut, status_code=201)
-def create_receipt(
-    db: Session = Depends(get_db),
+async def create_receipt(
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
     r = Receipt(user_id=user.id, status=ReceiptStatus.uploaded, raw_text=None)
     db.add(r)
-    db.commit()
-    db.refresh(r)
+    await db.commit()
+    await db.refresh(r)
     return r
 
 @router.post("/{receipt_id}/ocr", response_model=ReceiptOut, status_code=status.HTTP_202_ACCEPTED)
-def enqueue_ocr(
+async def enqueue_ocr(
     receipt_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    r = db.get(Receipt, receipt_id)
+    r = await db.get(Receipt, receipt_id)
     if not r:
         raise HTTPException(404, detail={"error": "not_found", "message": "receipt not found"})
     if r.user_id != user.id:
@@ -44,38 +53,48 @@ def enqueue_ocr(
     if r.status == ReceiptStatus.processing:
         raise HTTPException(409, detail={"error": "conflict", "message": "ocr already processing"})
 
-    data = file.file.read()
-    if not data:
+    if file.size == 0:
         raise HTTPException(400, detail={"error": "bad_request", "message": "empty file"})
+    if file.size is not None and file.size > settings.RECEIPT_MAX_UPLOAD_BYTES:
+        raise HTTPException(413, detail={"error": "too_large", "message": "file is too large"})
 
-    # загрузка в MinIO
+    # загрузка в MinIO потоком, без чтения файла целиком в память
     key = f"receipts/{receipt_id}/{uuid.uuid4().hex}"
-    put_object(key, data, content_type=file.content_type)
+    try:
+        size, sha256 = await run_in_threadpool(put_stream, key, file.file, content_type=file.content_type)
+    except ObjectTooLarge:
+        raise HTTPException(413, detail={"error": "too_large", "message": "file is too large"})
+    if size == 0:
+        await run_in_threadpool(delete_object, key)
+        raise HTTPException(400, detail={"error": "bad_request", "message": "empty file"})
 
     # ставим статус processing сразу (чтобы пользователь видел)
     r.status = ReceiptStatus.processing
     db.add(r)
-    db.commit()
-    db.refresh(r)
+    await db.commit()
+    await db.refresh(r)
 
-    # enqueue задача
-    ocr_process_receipt.delay(receipt_id, key)
+    # enqueue задача (одиночная или в пачку, см. OCR_BATCH_MODE)
+    await run_in_threadpool(ocr_queue.enqueue, receipt_id, key, sha256)
 
     return r
 
-@router.get("", response_model=list[ReceiptOut])
-def list_receipts(
-    status: ReceiptStatus | None = None,
+@router.get("", response_model=ReceiptPage)
+async def list_receipts(
+    status: list[ReceiptStatus] | None = Query(None),
+    status__ne: list[ReceiptStatus] | None = Query(None),
     from_: str | None = None,
     to: str | None = None,
-    db: Session = Depends(get_db),
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    q = db.query(Receipt).filter(Receipt.user_id == user.id)
-
-    filters = []
-    if status is not None:
-        filters.append(Receipt.status == status)
+    filters = [Receipt.user_id == user.id]
+    if status:
+        filters.append(Receipt.status.in_(status))
+    if status__ne:
+        filters.append(Receipt.status.not_in(status__ne))
 
     if from_ is not None:
         dt_from = datetime.fromisoformat(from_)
@@ -84,21 +103,112 @@ def list_receipts(
         dt_to = datetime.fromisoformat(to)
         filters.append(Receipt.created_at <= dt_to)
 
-    if filters:
-        q = q.filter(and_(*filters))
-
-    return q.order_by(Receipt.created_at.desc()).all()
+    total = await db.scalar(select(func.count()).select_from(Receipt).where(and_(*filters)))
+
+    if cursor is not None:
+        c_ts, c_id = decode_cursor(cursor)
+        filters.append(tuple_(Receipt.created_at, Receipt.id) < tuple_(c_ts, c_id))
+
+    # только нужные колонки — raw_text в список не тянем
+    rows = (
+        await db.execute(
+            select(Receipt.id, Receipt.status, Receipt.created_at)
+            .where(and_(*filters))
+            .order_by(Receipt.created_at.desc(), Receipt.id.desc())
+            .limit(limit + 1)
+        )
+    ).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return ReceiptPage(
+        items=[ReceiptListItem(id=r.id, status=r.status, created_at=r.created_at) for r in rows],
+        total=total,
+        next_cursor=next_cursor,
+    )
 
 
 @router.get("/{receipt_id}", response_model=ReceiptOut)
-def get_receipt(
+async def get_receipt(
     receipt_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user),
 ):
-    r = db.get(Receipt, receipt_id)
+    r = await db.get(Receipt, receipt_id)
     if not r:
         raise HTTPException(404, detail={"error": "not_found", "message": "receipt not found"})
     if r.user_id != user.id:
         raise HTTPException(403, detail={"error": "forbidden", "message": "not your receipt"})
     return r
+
+
+@router.get("/{receipt_id}/wait", response_model=ReceiptOut)
+async def wait_receipt(
+    receipt_id: int,
+    timeout: float = Query(25, ge=0, le=55),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user),
+):
+    """Long-poll: отвечает, как только OCR закончился, или по таймауту с текущим статусом."""
+    r = await db.get(Receipt, receipt_id)
+    if not r:
+        raise HTTPException(404, detail={"error": "not_found", "message": "receipt not found"})
+    if r.user_id != user.id:
+        raise HTTPException(403, detail={"error": "forbidden", "message": "not your receipt"})
+    if r.status != ReceiptStatus.processing:
+        return r
+
+    async with ocr_events.Waiter(receipt_id) as waiter:
+        # подписались — теперь перечитываем статус, чтобы не проспать событие между get и subscribe
+        await db.refresh(r)
+        if r.status != ReceiptStatus.processing:
+            return r
+
+        # соединение с БД не держим, пока ждём
+        await db.rollback()
+        await waiter.wait(timeout)
+
+    await db.refresh(r)
+    return r
+
+
+@router.get("/{receipt_id}/full", response_model=ReceiptFullOut)
+async def get_receipt_full(
+    receipt_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user),
+):
+    """Чек + его живые позиции + статус матчинга одним запросом. Поддерживает If-None-Match."""
+    q = (
+        select(Receipt, ReceiptItem, Product.code)
+        .outerjoin(
+            ReceiptItem,
+            and_(
+                ReceiptItem.receipt_id == Receipt.id,
+                ReceiptItem.is_deleted == False,  # noqa: E712
+            ),
+        )
+        .outerjoin(Product, Product.id == ReceiptItem.product_id)
+        .where(Receipt.id == receipt_id)
+        .order_by(ReceiptItem.id.asc())
+    )
+    rows = (await db.execute(q)).all()
+    if not rows:
+        raise HTTPException(404, detail={"error": "not_found", "message": "receipt not found"})
+    r = rows[0][0]
+    if r.user_id != user.id:
+        raise HTTPException(403, detail={"error": "forbidden", "message": "not your receipt"})
+
+    items = [
+        ReceiptItemFullOut(
+            **ReceiptItemOut.model_validate(it).model_dump(),
+            product_code=code,
+            matched=it.product_id is not None,
+        )
+        for _, it, code in rows
+        if it is not None
+    ]
+    body = ReceiptFullOut(receipt=ReceiptOut.model_validate(r), items=items).model_dump_json().encode()
+    return json_with_etag(request, body, etag_for(body))
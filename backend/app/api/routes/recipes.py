@@ -1,35 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 
-from app.core.auth import require_role
+from app.core.auth import require_role_sync
 from app.core.deps import get_db
+from app.core.http_cache import json_with_etag
+from app.db.uow import sync_unit_of_work
 from app.models.product import Product
 from app.models.recipe import Recipe
 from app.schemas.recipe import RecipeItemIn, RecipeItemOut
+from app.services import catalog
 
 router = APIRouter(prefix="/recipes", tags=["recipes"])
 
 
 @router.get("/{product_id}", response_model=list[RecipeItemOut])
-def get_recipes(product_id: int, db: Session = Depends(get_db)):
-    product = db.get(Product, product_id)
-    if not product:
+def get_recipes(product_id: int, request: Request, db: Session = Depends(get_db)):
+    cached = catalog.recipes_json(db, product_id)
+    if cached is None:
         raise HTTPException(404, detail={"error": "not_found", "message": "product not found"})
-
-    return db.query(Recipe).filter(Recipe.product_id == product_id).all()
+    return json_with_etag(request, *cached)
 
 
 @router.put(
     "/{product_id}",
     response_model=list[RecipeItemOut],
-    dependencies=[Depends(require_role("admin"))],
+    dependencies=[Depends(require_role_sync("admin"))],
 )
 def put_recipes(product_id: int, items: list[RecipeItemIn], db: Session = Depends(get_db)):
-    product = db.get(Product, product_id)
-    if not product:
-        raise HTTPException(404, detail={"error": "not_found", "message": "product not found"})
+    with sync_unit_of_work(db, "put_recipes"):
+        product = db.get(Product, product_id)
+        if not product:
+            raise HTTPException(404, detail={"error": "not_found", "message": "product not found"})
 
-    with db.begin():
         db.query(Recipe).filter(Recipe.product_id == product_id).delete()
 
         rows = []
@@ -43,4 +45,5 @@ def put_recipes(product_id: int, items: list[RecipeItemIn], db: Session = Depend
             )
         db.add_all(rows)
 
+    catalog.bump("recipes")
     return db.query(Recipe).filter(Recipe.product_id == product_id).all()
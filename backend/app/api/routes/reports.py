@@ -1,21 +1,23 @@
-from datetime import datetime
+from datetime import datetime, time, timedelta, timezone
 from fastapi import APIRouter, Depends
-from sqlalchemy import and_, func, case
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.deps import get_db
+from app.core.deps import get_async_db
 from app.models.ingredient import Ingredient
+from app.models.inventory_daily_rollup import InventoryDailyRollup
 from app.models.inventory import Inventory
 from app.models.inventory_movement import InventoryMovement
 from app.schemas.reports import ConsumptionRow, StockRow
+from app.services.rollups import consumed_expr
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
 @router.get("/stock", response_model=list[StockRow])
-def report_stock(only_low: bool | None = False, db: Session = Depends(get_db)):
+async def report_stock(only_low: bool | None = False, db: AsyncSession = Depends(get_async_db)):
     q = (
-        db.query(
+        select(
             Inventory.ingredient_id.label("ingredient_id"),
             Ingredient.name.label("ingredient_name"),
             Inventory.on_hand_qty.label("on_hand_qty"),
@@ -27,41 +29,81 @@ def report_stock(only_low: bool | None = False, db: Session = Depends(get_db)):
     )
 
     if only_low:
-        q = q.filter(Inventory.on_hand_qty <= Inventory.min_qty)
+        q = q.where(Inventory.on_hand_qty <= Inventory.min_qty)
 
-    rows = q.order_by(Ingredient.name.asc()).all()
+    rows = (await db.execute(q.order_by(Ingredient.name.asc()))).all()
     return [StockRow(**r._asdict()) for r in rows]
 
 
+def _parse_ts(value: str) -> datetime:
+    # created_at хранится как naive UTC — aware-границы приводим туда же
+    ts = datetime.fromisoformat(value)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _next_midnight(ts: datetime) -> datetime:
+    day = datetime.combine(ts.date(), time.min)
+    return day if day == ts else day + timedelta(days=1)
+
+
 @router.get("/consumption", response_model=list[ConsumptionRow])
-def report_consumption(
+async def report_consumption(
     from_: str | None = None,
     to: str | None = None,
     ingredient_id: int | None = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    q = (
-        db.query(
-            InventoryMovement.ingredient_id.label("ingredient_id"),
-            Ingredient.name.label("ingredient_name"),
+    start = _parse_ts(from_) if from_ is not None else None
+    end = _parse_ts(to) if to is not None else None  # включительно
 
-            (func.sum(case((InventoryMovement.qty_delta < 0, -InventoryMovement.qty_delta), else_=0))).label(
-                "consumed_qty"
-            ),
+    # целые сутки [full_from, full_to) берём из суточных итогов, сырые движения — только по краям
+    full_from = _next_midnight(start) if start is not None else None
+    full_to = datetime.combine((end + timedelta(microseconds=1)).date(), time.min) if end is not None else None
+
+    parts = []
+    if full_from is None or full_to is None or full_from < full_to:
+        r = select(
+            InventoryDailyRollup.ingredient_id.label("ingredient_id"),
+            InventoryDailyRollup.consumed.label("consumed_qty"),
         )
-        .join(Ingredient, Ingredient.id == InventoryMovement.ingredient_id)
-    )
+        if full_from is not None:
+            r = r.where(InventoryDailyRollup.day >= full_from.date())
+        if full_to is not None:
+            r = r.where(InventoryDailyRollup.day < full_to.date())
+        if ingredient_id is not None:
+            r = r.where(InventoryDailyRollup.ingredient_id == ingredient_id)
+        parts.append(r)
 
-    filters = []
-    if ingredient_id is not None:
-        filters.append(InventoryMovement.ingredient_id == ingredient_id)
-    if from_ is not None:
-        filters.append(InventoryMovement.created_at >= datetime.fromisoformat(from_))
-    if to is not None:
-        filters.append(InventoryMovement.created_at <= datetime.fromisoformat(to))
+        edges = []
+        if start is not None and start < full_from:
+            edges.append(and_(InventoryMovement.created_at >= start, InventoryMovement.created_at < full_from))
+        if end is not None:
+            edges.append(and_(InventoryMovement.created_at >= full_to, InventoryMovement.created_at <= end))
+    else:
+        # диапазон внутри одних суток — только сырые движения
+        edges = [and_(InventoryMovement.created_at >= start, InventoryMovement.created_at <= end)]
 
-    if filters:
-        q = q.filter(and_(*filters))
+    if edges:
+        m = select(
+            InventoryMovement.ingredient_id.label("ingredient_id"),
+            consumed_expr.label("consumed_qty"),
+        ).where(or_(*edges))
+        if ingredient_id is not None:
+            m = m.where(InventoryMovement.ingredient_id == ingredient_id)
+        parts.append(m)
 
-    rows = q.group_by(InventoryMovement.ingredient_id, Ingredient.name).order_by(Ingredient.name.asc()).all()
+    u = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    q = (
+        select(
+            u.c.ingredient_id.label("ingredient_id"),
+            Ingredient.name.label("ingredient_name"),
+            func.sum(u.c.consumed_qty).label("consumed_qty"),
+        )
+        .join(Ingredient, Ingredient.id == u.c.ingredient_id)
+        .group_by(u.c.ingredient_id, Ingredient.name)
+        .order_by(Ingredient.name.asc())
+    )
+    rows = (await db.execute(q)).all()
     return [ConsumptionRow(**r._asdict()) for r in rows]
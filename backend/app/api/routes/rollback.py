@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import require_role, get_current_user
-from app.core.deps import get_db
+from app.core.deps import get_async_db
+from app.db.uow import unit_of_work
 from app.models.user import User
 from app.schemas.receipt import ReceiptOut
 from app.services.rollback import rollback_receipt
@@ -11,5 +12,6 @@ router = APIRouter(prefix="/receipts", tags=["rollback"])
 
 
 @router.post("/{receipt_id}/rollback", response_model=ReceiptOut)
-def rollback(receipt_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return rollback_receipt(db, receipt_id=receipt_id, user_id=user.id)
+async def rollback(receipt_id: int, db: AsyncSession = Depends(get_async_db), user: User = Depends(get_current_user)):
+    async with unit_of_work(db, "rollback"):
+        return await rollback_receipt(db, receipt_id=receipt_id, user_id=user.id)
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.core.auth import require_role
+from app.core.auth import invalidate_user, require_role_sync
 from app.core.deps import get_db
 from app.models.user import User
 from app.schemas.user_admin import UserCreate, UserOut, UserUpdate
@@ -10,12 +10,12 @@ from app.schemas.user_admin import UserCreate, UserOut, UserUpdate
 router = APIRouter(prefix="/users", tags=["users"])
 
 
-@router.get("", response_model=list[UserOut], dependencies=[Depends(require_role("admin"))])
+@router.get("", response_model=list[UserOut], dependencies=[Depends(require_role_sync("admin"))])
 def list_users(db: Session = Depends(get_db)):
     return db.query(User).order_by(User.id.asc()).all()
 
 
-@router.post("", response_model=UserOut, status_code=201, dependencies=[Depends(require_role("admin"))])
+@router.post("", response_model=UserOut, status_code=201, dependencies=[Depends(require_role_sync("admin"))])
 def create_user(payload: UserCreate, db: Session = Depends(get_db)):
     u = User(tg_user_id=payload.tg_user_id, username=payload.username, role=payload.role)
     db.add(u)
@@ -28,7 +28,7 @@ def create_user(payload: UserCreate, db: Session = Depends(get_db)):
     return u
 
 
-@router.patch("/{user_id}", response_model=UserOut, dependencies=[Depends(require_role("admin"))])
+@router.patch("/{user_id}", response_model=UserOut, dependencies=[Depends(require_role_sync("admin"))])
 def patch_user(user_id: int, payload: UserUpdate, db: Session = Depends(get_db)):
     u = db.get(User, user_id)
     if not u:
@@ -39,15 +39,17 @@ def patch_user(user_id: int, payload: UserUpdate, db: Session = Depends(get_db))
         u.role = payload.role
     db.add(u)
     db.commit()
+    invalidate_user(u.id)
     db.refresh(u)
     return u
 
 
-@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_role("admin"))])
+@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(require_role_sync("admin"))])
 def delete_user(user_id: int, db: Session = Depends(get_db)):
     u = db.get(User, user_id)
     if not u:
         raise HTTPException(404, detail={"error": "not_found", "message": "user not found"})
     db.delete(u)
     db.commit()
+    invalidate_user(user_id)
     return None
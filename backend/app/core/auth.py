@@ -1,21 +1,33 @@
+import time
+from collections import OrderedDict
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.deps import get_db
+from app.core.config import settings
+from app.core.deps import get_async_db, get_db
 from app.core.security import decode_token
 from app.models.user import User
 
 bearer = HTTPBearer(auto_error=False)
 
+# token -> (user_id, role, exp); подпись проверяем один раз на токен
+_tokens: OrderedDict[str, tuple[int, str | None, int | None]] = OrderedDict()
+# user_id -> (expires_at, значения колонок)
+_users: dict[int, tuple[float, dict]] = {}
+_USER_FIELDS = [a.key for a in inspect(User).column_attrs]
 
-def get_current_user(
-    creds: HTTPAuthorizationCredentials | None = Depends(bearer),
-    db: Session = Depends(get_db),
-) -> User:
-    if creds is None or not creds.credentials:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail={"error": "unauthorized"})
-    token = creds.credentials
+
+def _verify(token: str) -> tuple[int, str | None, int | None]:
+    hit = _tokens.get(token)
+    if hit is not None:
+        _tokens.move_to_end(token)
+        if hit[2] is None or hit[2] > time.time():
+            return hit
+        _tokens.pop(token, None)
 
     try:
         payload = decode_token(token)
@@ -26,16 +38,78 @@ def get_current_user(
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail={"error": "invalid_token"})
 
-    user = db.get(User, int(user_id))
+    entry = (int(user_id), payload.get("role"), payload.get("exp"))
+    _tokens[token] = entry
+    if len(_tokens) > settings.AUTH_TOKEN_CACHE_SIZE:
+        _tokens.popitem(last=False)
+    return entry
+
+
+def invalidate_user(user_id: int) -> None:
+    """Вызывать после изменения/удаления пользователя."""
+    _users.pop(user_id, None)
+
+
+def clear_auth_cache() -> None:
+    _tokens.clear()
+    _users.clear()
+
+
+def _user_id(creds: HTTPAuthorizationCredentials | None) -> int:
+    if creds is None or not creds.credentials:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail={"error": "unauthorized"})
+    user_id, _, _ = _verify(creds.credentials)
+    return user_id
+
+
+def _cached_user(user_id: int) -> User | None:
+    # из кеша отдаём новый transient User — общий ORM-объект между запросами не шарим
+    hit = _users.get(user_id)
+    if hit is not None and hit[0] > time.monotonic():
+        return User(**hit[1])
+    return None
+
+
+def _remember(user_id: int, user: User | None) -> User:
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail={"error": "user_not_found"})
+    _users[user_id] = (time.monotonic() + settings.AUTH_USER_CACHE_TTL, {f: getattr(user, f) for f in _USER_FIELDS})
+    return user
+
+
+async def get_current_user(
+    creds: HTTPAuthorizationCredentials | None = Depends(bearer),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    user_id = _user_id(creds)
+    return _cached_user(user_id) or _remember(user_id, await db.get(User, user_id))
+
+
+def get_current_user_sync(
+    creds: HTTPAuthorizationCredentials | None = Depends(bearer),
+    db: Session = Depends(get_db),
+) -> User:
+    """Для sync-роутов на get_db: тот же кеш, а сессия — та же, что у роута (одно соединение на запрос)."""
+    user_id = _user_id(creds)
+    return _cached_user(user_id) or _remember(user_id, db.get(User, user_id))
+
+
+def _check_role(user: User, allowed: tuple[str, ...]) -> User:
+    if user.role not in allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail={"error": "forbidden"})
     return user
 
 
 def require_role(*allowed: str):
-    def _guard(user: User = Depends(get_current_user)) -> User:
-        if user.role not in allowed:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail={"error": "forbidden"})
-        return user
+    async def _guard(user: User = Depends(get_current_user)) -> User:
+        return _check_role(user, allowed)
+
+    return _guard
+
+
+def require_role_sync(*allowed: str):
+    """require_role для sync-роутов на get_db — не берёт второе соединение из async-пула."""
+    def _guard(user: User = Depends(get_current_user_sync)) -> User:
+        return _check_role(user, allowed)
 
     return _guard
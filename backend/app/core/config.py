@@ -6,15 +6,64 @@ class Settings(BaseSettings):
     APP_NAME: str = "WeDrink API"
     DATABASE_URL: str
 
+    # пул соединений к Postgres: API (на каждый движок) и воркер (на процесс) — отдельно
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10
+    DB_POOL_RECYCLE: int = 1800
+    # pre-ping — лишний round trip на каждый checkout; с recycle обычно не нужен
+    DB_POOL_PRE_PING: bool = False
+    WORKER_DB_POOL_SIZE: int = 2
+    WORKER_DB_MAX_OVERFLOW: int = 0
+    # за PgBouncer (transaction pooling): свой пул не держим, prepared statements выключены
+    DB_PGBOUNCER: bool = False
+
     JWT_SECRET: str = "change_me"
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MIN: int = 60 * 24 * 30
 
+    # кеш авторизации в процессе: проверенные токены (LRU) и пользователи (TTL).
+    # /users сбрасывает свою реплику сразу, остальные видят изменения не позже TTL
+    AUTH_TOKEN_CACHE_SIZE: int = 1024
+    AUTH_USER_CACHE_TTL: float = 30
+
     REDIS_URL: str = "redis://localhost:6379/0"
 
     S3_ENDPOINT: str = "http://localhost:9000"
     S3_ACCESS_KEY: str = "minio"
     S3_SECRET_KEY: str = "minio12345"
     S3_BUCKET: str = "wedrink-receipts"
+    S3_MAX_POOL_CONNECTIONS: int = 20
+    S3_MAX_ATTEMPTS: int = 3
+    S3_CONNECT_TIMEOUT: float = 5
+    S3_READ_TIMEOUT: float = 30
+
+    RECEIPT_MAX_UPLOAD_BYTES: int = 15 * 1024 * 1024
+
+    # keyset-пагинация списков
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 500
+
+    # OCR: пакетный режим (копим чеки в Redis и гоним пачкой в воркере)
+    OCR_BATCH_MODE: bool = False
+    OCR_BATCH_SIZE: int = 8
+    OCR_BATCH_WORKERS: int = 2
+    OCR_REC_BATCH: int = 16
+    # задача из ocr:processing без ack дольше этого — воркер умер, возвращаем в очередь
+    OCR_PROCESSING_STALE_SEC: int = 600
+
+    # OCR: движок грузится в процессе воркера (worker_process_init), не в API
+    OCR_WARMUP: bool = True
+    OCR_INTRA_OP_THREADS: int = -1   # -1 — по умолчанию onnxruntime
+    OCR_INTER_OP_THREADS: int = -1
+
+    # OCR: предобработка (уменьшение, серый, поиск бумаги чека, выравнивание)
+    OCR_PREPROCESS: bool = False
+    OCR_MAX_SIDE: int = 1600
+
+    # OCR: кеш результатов по хешу фото (повторные отправки того же снимка)
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_TTL: int = 60 * 60 * 24 * 7
+    OCR_CACHE_MAX_ENTRIES: int = 5000
 
 settings = Settings()
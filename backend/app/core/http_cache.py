@@ -0,0 +1,30 @@
+import hashlib
+
+from fastapi import Request, Response, status
+
+
+def etag_for(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    # If-None-Match сравнивается слабо (RFC 9110): префикс W/ не учитываем
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match: "*", один ETag или список через запятую, в т.ч. W/"..."."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    want = _opaque(etag)
+    return any(_opaque(tag) == want for tag in if_none_match.split(","))
+
+
+def json_with_etag(request: Request, body: bytes, etag: str) -> Response:
+    # клиент с тем же ETag получает 304 без тела
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
@@ -0,0 +1,138 @@
+"""Метрики в текстовом формате Prometheus — свой минимальный реестр, без prometheus_client."""
+import threading
+import time
+from typing import Iterable
+
+from app.db.stats import track
+
+# секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+_LOCK = threading.Lock()
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _le(bound) -> str:
+    return 'le="%s"' % bound
+
+
+def histogram_lines(
+    name: str, label_names: tuple[str, ...], label_values: tuple,
+    buckets: Iterable[float], cumulative: Iterable[float], total: float, count: float,
+) -> list[str]:
+    lines = [
+        f"{name}_bucket{_fmt_labels(label_names, label_values, _le(b))} {c}"
+        for b, c in zip(buckets, cumulative)
+    ]
+    lines.append(f"{name}_bucket{_fmt_labels(label_names, label_values, _le('+Inf'))} {count}")
+    lines.append(f"{name}_sum{_fmt_labels(label_names, label_values)} {total}")
+    lines.append(f"{name}_count{_fmt_labels(label_names, label_values)} {count}")
+    return lines
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = ()) -> None:
+        self.name, self.doc, self.labels = name, doc, labels
+        self._values: dict[tuple, float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with _LOCK:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self) -> list[str]:
+        with _LOCK:
+            items = list(self._values.items())
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"] + [
+            f"{self.name}{_fmt_labels(self.labels, lv)} {v}" for lv, v in items
+        ]
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> None:
+        self.name, self.doc, self.labels, self.buckets = name, doc, labels, tuple(buckets)
+        # label_values -> [счётчики по бакетам (не кумулятивные)..., sum, count]
+        self._values: dict[tuple, list[float]] = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *label_values) -> None:
+        with _LOCK:
+            st = self._values.get(label_values)
+            if st is None:
+                st = self._values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    st[i] += 1
+                    break
+            st[-2] += value
+            st[-1] += 1
+
+    def collect(self) -> list[str]:
+        with _LOCK:
+            items = [(lv, list(st)) for lv, st in self._values.items()]
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        for lv, st in items:
+            cumulative, acc = [], 0
+            for c in st[: len(self.buckets)]:
+                acc += c
+                cumulative.append(acc)
+            lines += histogram_lines(self.name, self.labels, lv, self.buckets, cumulative, round(st[-2], 6), st[-1])
+        return lines
+
+
+REGISTRY: list[Counter | Histogram] = []
+
+http_requests = Counter("http_requests_total", "HTTP requests", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+db_queries = Histogram(
+    "http_request_db_queries", "SQL statements per HTTP request", ("method", "route"), buckets=COUNT_BUCKETS
+)
+db_time = Histogram("http_request_db_seconds", "Time in SQL per HTTP request", ("method", "route"))
+
+
+def render(extra: Iterable[str] = ()) -> str:
+    lines: list[str] = []
+    for m in REGISTRY:
+        lines += m.collect()
+    lines += extra
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Чистый ASGI: без BaseHTTPMiddleware, не буферизует стриминговые ответы."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+
+        async def _send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with track() as st:
+            try:
+                await self.app(scope, receive, _send)
+            finally:
+                # шаблон пути, а не сам путь — иначе кардинальность по id
+                route = scope.get("route")
+                path = getattr(route, "path", "unmatched")
+                method = scope["method"]
+                http_requests.inc(method, path, status_code)
+                http_latency.observe(time.perf_counter() - started, method, path)
+                db_queries.observe(st.statements, method, path)
+                db_time.observe(st.db_ms / 1000, method, path)
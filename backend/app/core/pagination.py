@@ -0,0 +1,19 @@
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+
+
+# keyset-курсор: (created_at, id) последней отданной строки, непрозрачный для клиента
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, detail={"error": "bad_request", "message": "invalid cursor"})
@@ -0,0 +1,21 @@
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+_redis: redis.Redis | None = None
+_async_redis: aioredis.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+def get_async_redis() -> aioredis.Redis:
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.Redis.from_url(settings.REDIS_URL)
+    return _async_redis
@@ -0,0 +1,74 @@
+import time
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, Pool, QueuePool
+
+from app.core.config import settings
+
+
+class _WaitStats:
+    """Сколько ждали свободное соединение из пула (checkout)."""
+
+    def _record_wait(self, started: float, ok: bool) -> None:
+        ms = (time.perf_counter() - started) * 1000
+        st = self.wait_stats
+        st["checkouts"] += 1
+        st["wait_ms_total"] += ms
+        st["wait_ms_max"] = max(st["wait_ms_max"], ms)
+        if not ok:
+            st["timeouts"] += 1
+
+    def _do_get(self):
+        started = time.perf_counter()
+        ok = False
+        try:
+            conn = super()._do_get()
+            ok = True
+            return conn
+        finally:
+            self._record_wait(started, ok)
+
+
+class TimedQueuePool(_WaitStats, QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = {"checkouts": 0, "timeouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+
+class TimedAsyncAdaptedQueuePool(_WaitStats, AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = {"checkouts": 0, "timeouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+
+def engine_kwargs(*, worker: bool = False, is_async: bool = False) -> dict:
+    """Параметры create_engine/create_async_engine из Settings."""
+    if settings.DB_PGBOUNCER:
+        # prepare_threshold=None — psycopg3 не создаёт prepared statements (в transaction-режиме они ломаются)
+        return {"poolclass": NullPool, "connect_args": {"prepare_threshold": None}}
+
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.WORKER_DB_POOL_SIZE if worker else settings.DB_POOL_SIZE,
+        "max_overflow": settings.WORKER_DB_MAX_OVERFLOW if worker else settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def pool_status(pool: Pool) -> dict:
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    st = pool.wait_stats if isinstance(pool, _WaitStats) else {}
+    checkouts = st.get("checkouts", 0)
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": checkouts,
+        "timeouts": st.get("timeouts", 0),
+        "wait_ms_avg": round(st["wait_ms_total"] / checkouts, 3) if checkouts else 0.0,
+        "wait_ms_max": round(st.get("wait_ms_max", 0.0), 3),
+    }
@@ -1,11 +1,29 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from app.db import stats  # noqa: F401  (регистрирует счётчики выражений на Engine)
+from app.db.pool import engine_kwargs, pool_status
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-)
+engine = create_engine(settings.DATABASE_URL, **engine_kwargs())
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+# API: async-движок на том же URL (postgresql+psycopg сам выбирает async-драйвер psycopg3)
+async_engine = create_async_engine(settings.DATABASE_URL, **engine_kwargs(is_async=True))
+
+# expire_on_commit=False — иначе после commit любое обращение к атрибуту полезет в БД синхронно
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+def configure_for_worker() -> None:
+    """Дочерний процесс Celery: свой sync-движок с пулом WORKER_*, унаследованные после fork соединения не трогаем."""
+    global engine
+    engine.dispose(close=False)
+    engine = create_engine(settings.DATABASE_URL, **engine_kwargs(worker=True))
+    SessionLocal.configure(bind=engine)
+
+
+def pools_status() -> dict:
+    return {"sync": pool_status(engine.pool), "async": pool_status(async_engine.sync_engine.pool)}
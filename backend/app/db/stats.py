@@ -0,0 +1,47 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class QueryStats:
+    statements: int = 0
+    db_ms: float = 0.0
+
+
+# стек активных счётчиков: запрос (middleware) -> транзакция (unit_of_work); каждый видит свои выражения
+_active: ContextVar[tuple[QueryStats, ...]] = ContextVar("db_query_stats", default=())
+
+
+@contextmanager
+def track() -> Iterator[QueryStats]:
+    st = QueryStats()
+    token = _active.set(_active.get() + (st,))
+    try:
+        yield st
+    finally:
+        _active.reset(token)
+
+
+# слушаем класс Engine — ловит и sync engine, и async_engine.sync_engine
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._stats_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    active = _active.get()
+    if not active:
+        return
+    started = getattr(context, "_stats_started", None)
+    ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+    for st in active:
+        st.statements += 1
+        st.db_ms += ms
@@ -0,0 +1,56 @@
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.stats import QueryStats, track
+
+log = logging.getLogger(__name__)
+
+
+def _report(name: str, st: QueryStats, started: float, ok: bool) -> None:
+    log.info(
+        "uow %s %s: statements=%s db=%.1fms tx=%.1fms",
+        name, "commit" if ok else "rollback", st.statements, st.db_ms, (time.perf_counter() - started) * 1000,
+    )
+
+
+@asynccontextmanager
+async def unit_of_work(db: AsyncSession, name: str) -> AsyncIterator[AsyncSession]:
+    """Ровно одна транзакция на операцию: commit в конце, rollback на любой ошибке.
+
+    Транзакцию открывает autobegin первого же запроса внутри блока — никаких
+    begin()/begin_nested() поверх, поэтому db.get() перед записью больше не ломает begin.
+    """
+    started = time.perf_counter()
+    with track() as st:
+        ok = False
+        try:
+            yield db
+            await db.commit()
+            ok = True
+        except BaseException:
+            await db.rollback()
+            raise
+        finally:
+            _report(name, st, started, ok)
+
+
+@contextmanager
+def sync_unit_of_work(db: Session, name: str) -> Iterator[Session]:
+    """То же для sync-роутов (Session)."""
+    started = time.perf_counter()
+    with track() as st:
+        ok = False
+        try:
+            yield db
+            db.commit()
+            ok = True
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            _report(name, st, started, ok)
@@ -1,13 +1,22 @@
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
 from app.core.errors import install_error_handlers
+from app.core.metrics import MetricsMiddleware
 from app.api.router import router as api_router
+from app.services.storage import ensure_bucket
 
 app = FastAPI(title="WeDrinkStorage API")
 @app.on_event("startup")
 async def startup():
+    try:
+        await run_in_threadpool(ensure_bucket)
+    except Exception as e:
+        # MinIO может подняться позже — тогда бакет проверится при первой загрузке
+        print(f"ensure_bucket failed: {e}", flush=True)
     print("STARTUP OK", flush=True)
 install_error_handlers(app)
+app.add_middleware(MetricsMiddleware)
 app.include_router(api_router, prefix="/api")
 print(1)
@@ -6,6 +6,7 @@ from app.models.inventory import Inventory
 from app.models.receipt import Receipt
 from app.models.receipt_item import ReceiptItem
 from app.models.inventory_movement import InventoryMovement
+from app.models.inventory_daily_rollup import InventoryDailyRollup
 
 __all__ = [
     "User",
@@ -16,4 +17,5 @@ __all__ = [
     "Receipt",
     "ReceiptItem",
     "InventoryMovement",
+    "InventoryDailyRollup",
 ]
@@ -0,0 +1,19 @@
+from datetime import date
+
+from sqlalchemy import Date, ForeignKey, Numeric
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class InventoryDailyRollup(Base):
+    """Суточные итоги движений по ингредиенту (день — по created_at движения)."""
+
+    __tablename__ = "inventory_daily_rollups"
+
+    ingredient_id: Mapped[int] = mapped_column(ForeignKey("ingredients.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    # consumed — сумма |отрицательных| дельт, received — сумма положительных
+    consumed: Mapped[float] = mapped_column(Numeric(14, 3), nullable=False, server_default="0")
+    received: Mapped[float] = mapped_column(Numeric(14, 3), nullable=False, server_default="0")
@@ -8,7 +8,9 @@ class InventoryMovement(Base):
     __tablename__ = "inventory_movements"
     __table_args__ = (
         Index("ix_inventory_movements_ingredient_id_created_at", "ingredient_id", "created_at"),
-        Index("ix_inventory_movements_source_receipt_id", "source_receipt_id"),
+        # под keyset (created_at, id) и фильтр по чеку + датам
+        Index("ix_inventory_movements_created_at_id", "created_at", "id"),
+        Index("ix_inventory_movements_source_receipt_id_created_at_id", "source_receipt_id", "created_at", "id"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -6,7 +6,8 @@ from app.models.enums import ReceiptStatus
 
 class Receipt(Base):
     __tablename__ = "receipts"
-    __table_args__ = (Index("ix_receipts_user_id_created_at", "user_id", "created_at"),)
+    # (user_id, created_at, id) — под keyset-список чеков пользователя
+    __table_args__ = (Index("ix_receipts_user_id_created_at_id", "user_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -19,4 +20,7 @@ class Receipt(Base):
     ocr_started_at: Mapped[str | None] = mapped_column(TIMESTAMP, nullable=True)
     ocr_finished_at: Mapped[str | None] = mapped_column(TIMESTAMP, nullable=True)
 
+    # время последнего apply (= created_at его движений): граница для компенсации в rollback
+    applied_at: Mapped[str | None] = mapped_column(TIMESTAMP, nullable=True)
+
     created_at: Mapped[str] = mapped_column(TIMESTAMP, nullable=False, server_default=func.now())
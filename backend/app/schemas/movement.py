@@ -19,3 +19,8 @@ class MovementOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class MovementPage(BaseModel):
+    items: list[MovementOut]
+    next_cursor: str | None
@@ -1,7 +1,8 @@
 from datetime import datetime
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.models.enums import ReceiptStatus
+from app.schemas.receipt_item import ReceiptItemOut
 
 
 class ReceiptOut(BaseModel):
@@ -15,9 +16,49 @@ class ReceiptOut(BaseModel):
         from_attributes = True
 
 
+class ReceiptListItem(BaseModel):
+    """Строка списка чеков — без raw_text."""
+    id: int
+    status: ReceiptStatus
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ReceiptPage(BaseModel):
+    items: list[ReceiptListItem]
+    total: int
+    next_cursor: str | None
+
+
 class ReceiptCreateOut(BaseModel):
     id: int
     status: ReceiptStatus
 
     class Config:
         from_attributes = True
+
+
+class ReceiptItemFullOut(ReceiptItemOut):
+    product_code: str | None
+    matched: bool
+
+
+class ReceiptFullOut(BaseModel):
+    receipt: ReceiptOut
+    items: list[ReceiptItemFullOut]
+
+
+class ReceiptApplyBatchIn(BaseModel):
+    receipt_ids: list[int] = Field(min_length=1, max_length=200)
+
+
+class ReceiptApplyError(BaseModel):
+    receipt_id: int
+    detail: dict
+
+
+class ReceiptApplyBatchOut(BaseModel):
+    applied: list[ReceiptOut]
+    errors: list[ReceiptApplyError]
@@ -1,6 +1,8 @@
+from decimal import Decimal
+
 from fastapi import HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, Numeric, column, exists, func, insert, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.enums import ReceiptStatus
 from app.models.inventory import Inventory
@@ -8,12 +10,116 @@ from app.models.inventory_movement import InventoryMovement
 from app.models.recipe import Recipe
 from app.models.receipt import Receipt
 from app.models.receipt_item import ReceiptItem
-from decimal import Decimal
+from app.services.rollups import record_movements
+
+
+async def _check_items(db: AsyncSession, receipt_ids: list[int]) -> dict[int, dict]:
+    """Ошибки валидации по чекам: нет позиций / не сматчены / у продукта нет рецепта."""
+    has_recipe = exists().where(Recipe.product_id == ReceiptItem.product_id)
+    rows = (
+        await db.execute(
+            select(ReceiptItem.receipt_id, ReceiptItem.id, ReceiptItem.product_id, has_recipe)
+            .where(
+                ReceiptItem.receipt_id.in_(receipt_ids),
+                ReceiptItem.is_deleted == False,  # noqa: E712
+            )
+            .order_by(ReceiptItem.receipt_id, ReceiptItem.id)
+        )
+    ).all()
+
+    seen: set[int] = set()
+    unmatched: dict[int, list[int]] = {}
+    no_recipe: dict[int, set[int]] = {}
+    for rid, item_id, product_id, recipe_exists in rows:
+        seen.add(rid)
+        if product_id is None:
+            unmatched.setdefault(rid, []).append(item_id)
+        elif not recipe_exists:
+            no_recipe.setdefault(rid, set()).add(product_id)
+
+    errors: dict[int, dict] = {}
+    for rid in receipt_ids:
+        if rid not in seen:
+            errors[rid] = {"error": "conflict", "message": "no items to apply"}
+        elif rid in unmatched:
+            errors[rid] = {
+                "error": "unmatched_items",
+                "message": "apply forbidden: some items have no product_id",
+                "item_ids": unmatched[rid],
+            }
+        elif rid in no_recipe:
+            errors[rid] = {
+                "error": "no_recipe",
+                "message": "apply forbidden: product has no recipe",
+                "product_ids": sorted(no_recipe[rid]),
+            }
+    return errors
+
+
+async def _compute_deltas(db: AsyncSession, receipt_ids: list[int]) -> dict[tuple[int, int], Decimal]:
+    """(receipt_id, ingredient_id) -> delta, считается в БД: items JOIN recipes GROUP BY."""
+    # округляем до точности колонки, чтобы остаток и движения совпадали копейка в копейку
+    delta = func.round(-func.sum(ReceiptItem.qty * Recipe.qty), 3)
+    rows = (
+        await db.execute(
+            select(ReceiptItem.receipt_id, Recipe.ingredient_id, delta)
+            .join(Recipe, Recipe.product_id == ReceiptItem.product_id)
+            .where(
+                ReceiptItem.receipt_id.in_(receipt_ids),
+                ReceiptItem.is_deleted == False,  # noqa: E712
+            )
+            .group_by(ReceiptItem.receipt_id, Recipe.ingredient_id)
+        )
+    ).all()
+    return {(rid, ing_id): d for rid, ing_id, d in rows}
 
 
+async def lock_inventory(db: AsyncSession, ingredient_ids: list[int]) -> set[int]:
+    # блокируем строго по возрастанию ingredient_id — параллельные apply не дедлочатся
+    rows = await db.execute(
+        select(Inventory.ingredient_id)
+        .where(Inventory.ingredient_id.in_(ingredient_ids))
+        .order_by(Inventory.ingredient_id)
+        .with_for_update()
+    )
+    return set(rows.scalars().all())
+
+
+async def apply_deltas(db: AsyncSession, deltas: dict[tuple[int, int], Decimal], user_id: int) -> list[int]:
+    """Один UPDATE ... FROM (VALUES) по остаткам + один multi-row INSERT движений + upsert суточных итогов.
 
-def apply_receipt(db: Session, *, receipt_id: int, user_id: int) -> Receipt:
-    receipt = db.get(Receipt, receipt_id)
+    Строки inventory уже залочены.
+    """
+    per_ing: dict[int, Decimal] = {}
+    for (_, ing_id), d in deltas.items():
+        per_ing[ing_id] = per_ing.get(ing_id, Decimal(0)) + d
+
+    d = values(column("ingredient_id", Integer), column("delta", Numeric(12, 3)), name="d").data(
+        sorted(per_ing.items())
+    )
+    await db.execute(
+        update(Inventory)
+        .where(Inventory.ingredient_id == d.c.ingredient_id)
+        .values(on_hand_qty=Inventory.on_hand_qty + d.c.delta),
+        execution_options={"synchronize_session": False},
+    )
+
+    rows = [
+        {"ingredient_id": ing_id, "qty_delta": delta, "source_receipt_id": rid, "created_by": user_id}
+        for (rid, ing_id), delta in sorted(deltas.items())
+    ]
+    res = await db.execute(insert(InventoryMovement).values(rows).returning(InventoryMovement.id))
+    movement_ids = list(res.scalars().all())
+    await record_movements(db, movement_ids)
+    return movement_ids
+
+
+async def apply_receipt(db: AsyncSession, *, receipt_id: int, user_id: int) -> Receipt:
+    # commit/rollback делает вызывающий через unit_of_work
+    # lock чека сразу: статус проверяем под блокировкой, двойной apply невозможен
+    receipt = (
+        await db.execute(select(Receipt).where(Receipt.id == receipt_id).with_for_update())
+    ).scalar_one_or_none()
     if not receipt:
         raise HTTPException(404, detail={"error": "not_found", "message": "receipt not found"})
     if receipt.user_id != user_id:
@@ -21,99 +127,82 @@ def apply_receipt(db: Session, *, receipt_id: int, user_id: int) -> Receipt:
     if receipt.status == ReceiptStatus.applied:
         raise HTTPException(409, detail={"error": "conflict", "message": "receipt already applied"})
 
-    items = (
-        db.query(ReceiptItem)
-        .filter(
-            ReceiptItem.receipt_id == receipt_id,
-            ReceiptItem.is_deleted == False,  # noqa: E712
-        )
-        .all()
-    )
-    if not items:
-        raise HTTPException(409, detail={"error": "conflict", "message": "no items to apply"})
+    errors = await _check_items(db, [receipt_id])
+    if receipt_id in errors:
+        raise HTTPException(409, detail=errors[receipt_id])
 
-    missing = [it.id for it in items if it.product_id is None]
-    if missing:
+    deltas = await _compute_deltas(db, [receipt_id])
+    ing_ids = sorted({ing_id for _, ing_id in deltas})
+    locked = await lock_inventory(db, ing_ids)
+    missing_inv = [i for i in ing_ids if i not in locked]
+    if missing_inv:
         raise HTTPException(
             409,
-            detail={
-                "error": "unmatched_items",
-                "message": "apply forbidden: some items have no product_id",
-                "item_ids": missing,
-            },
+            detail={"error": "inventory_missing", "message": "inventory row missing for ingredient", "ingredient_ids": missing_inv},
         )
 
-    # Собираем все рецепты для продуктов одним запросом
-    product_ids = sorted({it.product_id for it in items if it.product_id is not None})
-    recipes = db.query(Recipe).filter(Recipe.product_id.in_(product_ids)).all()
-
-    # map: product_id -> list[Recipe]
-    recipe_map: dict[int, list[Recipe]] = {}
-    for r in recipes:
-        recipe_map.setdefault(r.product_id, []).append(r)
+    await apply_deltas(db, deltas, user_id)
 
-    # Если у продукта нет рецепта — запрещаем (иначе непонятно что списывать)
-    no_recipe = [pid for pid in product_ids if pid not in recipe_map]
-    if no_recipe:
-        raise HTTPException(
-            409,
-            detail={"error": "no_recipe", "message": "apply forbidden: product has no recipe", "product_ids": no_recipe},
-        )
-
-    # Считаем дельты по ингредиентам (агрегация) чтобы делать меньше updates
-    # delta = sum( -(item.qty * recipe.qty) )
-    agg: dict[int, Decimal] = {}
-    for it in items:
-        for r in recipe_map[it.product_id]:
-            ing_id = r.ingredient_id
-            delta = Decimal(-(Decimal(it.qty) * Decimal(r.qty)))
-            agg[ing_id] = agg.get(ing_id, Decimal(0)) + delta
-
-    # Транзакция: lock inventory rows + insert movements + update inventory + update receipt
-    with db.begin_nested():
-        # lock receipt row тоже полезно
-        db.execute(
-            select(Receipt.id)
-            .where(Receipt.id == receipt_id)
-            .with_for_update()
-        )
+    receipt.status = ReceiptStatus.applied
+    # now() — время транзакции, совпадает с created_at только что вставленных движений
+    receipt.applied_at = func.now()
+    db.add(receipt)
+    return receipt
 
-        # lock inventory rows
-        inv_rows = (
-            db.execute(
-                select(Inventory)
-                .where(Inventory.ingredient_id.in_(list(agg.keys())))
-                .with_for_update()
-            )
-            .scalars()
-            .all()
-        )
-        inv_map = {inv.ingredient_id: inv for inv in inv_rows}
 
-        missing_inv = [ing_id for ing_id in agg.keys() if ing_id not in inv_map]
+async def apply_receipts(
+    db: AsyncSession, *, receipt_ids: list[int], user_id: int
+) -> tuple[list[Receipt], dict[int, dict]]:
+    """Пакетный apply: валидация всех чеков заранее, одна блокировка и один UPDATE остатков.
+
+    Чеки с ошибками пропускаются (ошибка по каждому в errors), остальные применяются в одной транзакции.
+    Commit делает вызывающий через unit_of_work.
+    """
+    ids = list(dict.fromkeys(receipt_ids))
+
+    # чеки лочим в порядке id — как и остатки, чтобы пакеты не дедлочились друг с другом
+    receipts = {
+        r.id: r
+        for r in (
+            await db.execute(select(Receipt).where(Receipt.id.in_(ids)).order_by(Receipt.id).with_for_update())
+        ).scalars().all()
+    }
+
+    errors: dict[int, dict] = {}
+    for rid in ids:
+        r = receipts.get(rid)
+        if not r:
+            errors[rid] = {"error": "not_found", "message": "receipt not found"}
+        elif r.user_id != user_id:
+            errors[rid] = {"error": "forbidden", "message": "not your receipt"}
+        elif r.status == ReceiptStatus.applied:
+            errors[rid] = {"error": "conflict", "message": "receipt already applied"}
+
+    pending = [rid for rid in ids if rid not in errors]
+    if pending:
+        errors.update(await _check_items(db, pending))
+        pending = [rid for rid in pending if rid not in errors]
+
+    deltas = await _compute_deltas(db, pending) if pending else {}
+    ing_ids = sorted({ing_id for _, ing_id in deltas})
+    locked = await lock_inventory(db, ing_ids) if ing_ids else set()
+
+    by_receipt: dict[int, set[int]] = {}
+    for rid, ing_id in deltas:
+        by_receipt.setdefault(rid, set()).add(ing_id)
+    for rid in pending:
+        missing_inv = sorted(by_receipt.get(rid, set()) - locked)
         if missing_inv:
-            raise HTTPException(
-                409,
-                detail={"error": "inventory_missing", "message": "inventory row missing for ingredient", "ingredient_ids": missing_inv},
-            )
-
-        # insert movements + update inventory
-        for ing_id, delta in agg.items():
-            mv = InventoryMovement(
-                ingredient_id=ing_id,
-                qty_delta=delta,
-                source_receipt_id=receipt_id,
-                created_by=user_id,
-            )
-            db.add(mv)
-
-            inv = inv_map[ing_id]
-            inv.on_hand_qty = inv.on_hand_qty + delta
-            db.add(inv)
-
-        receipt.status = ReceiptStatus.applied
-        db.add(receipt)
-
-    db.commit()
-    db.refresh(receipt)
-    return receipt
+            errors[rid] = {
+                "error": "inventory_missing",
+                "message": "inventory row missing for ingredient",
+                "ingredient_ids": missing_inv,
+            }
+
+    ok = [rid for rid in pending if rid not in errors]
+    if ok:
+        ok_set = set(ok)
+        await apply_deltas(db, {k: v for k, v in deltas.items() if k[0] in ok_set}, user_id)
+        await db.execute(update(Receipt).where(Receipt.id.in_(ok)).values(status=ReceiptStatus.applied, applied_at=func.now()))
+
+    return [receipts[rid] for rid in ok], errors
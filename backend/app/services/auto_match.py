@@ -0,0 +1,41 @@
+from fastapi import HTTPException
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.enums import ReceiptStatus
+from app.models.product import Product
+from app.models.receipt import Receipt
+from app.models.receipt_item import ReceiptItem
+
+
+async def auto_match_receipt(db: AsyncSession, *, receipt_id: int, user_id: int) -> list[ReceiptItem]:
+    # commit/rollback делает вызывающий через unit_of_work
+    receipt = await db.get(Receipt, receipt_id)
+    if not receipt:
+        raise HTTPException(404, detail={"error": "not_found", "message": "receipt not found"})
+    if receipt.user_id != user_id:
+        raise HTTPException(403, detail={"error": "forbidden", "message": "not your receipt"})
+    if receipt.status == ReceiptStatus.applied:
+        raise HTTPException(409, detail={"error": "conflict", "message": "receipt already applied"})
+
+    # один UPDATE ... FROM products: все несматченные позиции чека по коду товара
+    stmt = (
+        update(ReceiptItem)
+        .where(
+            ReceiptItem.receipt_id == receipt_id,
+            ReceiptItem.product_id.is_(None),
+            ReceiptItem.is_deleted == False,  # noqa: E712
+            func.upper(func.trim(ReceiptItem.product_code_raw)) == func.upper(Product.code),
+        )
+        .values(product_id=Product.id, updated_at=func.now())
+        .returning(ReceiptItem)
+        .execution_options(synchronize_session=False)
+    )
+    items = list((await db.scalars(stmt)).all())
+
+    # как и ручной match — чек считается отредактированным
+    if items and receipt.status in (ReceiptStatus.parsed, ReceiptStatus.uploaded):
+        receipt.status = ReceiptStatus.edited
+        db.add(receipt)
+
+    return sorted(items, key=lambda it: it.id)
@@ -0,0 +1,131 @@
+import logging
+import time
+from typing import Any, Callable, TypeVar
+
+import redis
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.http_cache import etag_for
+from app.core.redis_client import get_redis
+from app.models.ingredient import Ingredient
+from app.models.product import Product
+from app.models.recipe import Recipe
+from app.schemas.ingredient import IngredientOut
+from app.schemas.product import ProductOut
+from app.schemas.recipe import RecipeItemOut
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# версия справочника в Redis: админские ручки инкрементят, кеши в процессах сверяются
+VERSION_KEY = "catalog:version:{name}"
+
+
+def _seed() -> int:
+    # пропавший ключ (flush/eviction) заводим заново от текущего времени, а не от 0:
+    # новая эпоха не совпадёт ни с одной версией, закешированной до потери ключа
+    return time.time_ns()
+
+
+def bump(name: str) -> None:
+    key = VERSION_KEY.format(name=name)
+    try:
+        pipe = get_redis().pipeline()
+        pipe.set(key, _seed(), nx=True)
+        pipe.incr(key)
+        pipe.execute()
+    except redis.RedisError as e:
+        log.warning("catalog bump %s failed: %s", name, e)
+
+
+def version(name: str) -> int | None:
+    """None — Redis недоступен, кешам нужно считать себя устаревшими."""
+    key = VERSION_KEY.format(name=name)
+    try:
+        r = get_redis()
+        v = r.get(key)
+        if v is None:
+            # SET NX: из гонки реплик побеждает один seed, остальные читают его
+            r.set(key, _seed(), nx=True)
+            v = r.get(key)
+    except redis.RedisError as e:
+        log.warning("catalog version %s failed: %s", name, e)
+        return None
+    return int(v) if v is not None else None
+
+
+def normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+
+# key -> (версия справочника, значение); значение пересобирается только при смене версии
+_entries: dict[str, tuple[int, Any]] = {}
+
+
+def cached(key: str, name: str, load: Callable[[], T]) -> T:
+    """Read-through кеш в памяти процесса, когерентный между репликами через версию в Redis."""
+    v = version(name)
+    hit = _entries.get(key)
+    if v is not None and hit is not None and hit[0] == v:
+        return hit[1]
+    value = load()
+    # без Redis не кешируем: иначе не узнаем об изменениях на других репликах
+    if v is not None:
+        _entries[key] = (v, value)
+    return value
+
+
+def _json(adapter: TypeAdapter, rows) -> tuple[bytes, str]:
+    body = adapter.dump_json(rows)
+    return body, etag_for(body)
+
+
+_products_adapter = TypeAdapter(list[ProductOut])
+_ingredients_adapter = TypeAdapter(list[IngredientOut])
+_recipes_adapter = TypeAdapter(list[RecipeItemOut])
+
+
+def products_json(db: Session) -> tuple[bytes, str]:
+    return cached(
+        "products:json", "products",
+        lambda: _json(_products_adapter, db.execute(select(Product).order_by(Product.id.asc())).scalars().all()),
+    )
+
+
+def product_ids(db: Session) -> frozenset[int]:
+    return cached("products:ids", "products", lambda: frozenset(db.execute(select(Product.id)).scalars().all()))
+
+
+def product_code_map(db: Session) -> dict[str, int]:
+    """code -> product_id (нормализованный код)."""
+    return cached(
+        "products:code_map", "products",
+        lambda: {normalize_code(code): pid for pid, code in db.execute(select(Product.id, Product.code)).all()},
+    )
+
+
+def ingredients_json(db: Session) -> tuple[bytes, str]:
+    return cached(
+        "ingredients:json", "ingredients",
+        lambda: _json(_ingredients_adapter, db.execute(select(Ingredient).order_by(Ingredient.id.asc())).scalars().all()),
+    )
+
+
+def _load_recipes(db: Session) -> dict[int, tuple[bytes, str]]:
+    by_product: dict[int, list[Recipe]] = {}
+    for r in db.execute(select(Recipe).order_by(Recipe.product_id, Recipe.id)).scalars().all():
+        by_product.setdefault(r.product_id, []).append(r)
+    return {pid: _json(_recipes_adapter, rows) for pid, rows in by_product.items()}
+
+
+_EMPTY_RECIPE = _json(_recipes_adapter, [])
+
+
+def recipes_json(db: Session, product_id: int) -> tuple[bytes, str] | None:
+    """None — продукта нет."""
+    if product_id not in product_ids(db):
+        return None
+    return cached("recipes:json", "recipes", lambda: _load_recipes(db)).get(product_id, _EMPTY_RECIPE)
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import redis
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+if TYPE_CHECKING:
+    import numpy as np
+
+log = logging.getLogger(__name__)
+
+KEY_PREFIX = "ocr:cache:"
+INDEX_KEY = "ocr:cache:index"   # zset: digest -> время записи (для вытеснения по размеру)
+STATS_KEY = "ocr:cache:stats"   # hash: hits / misses
+
+
+def cache_key(sha256_hex: str) -> str:
+    # режим OCR входит в ключ: с предобработкой и без результат разный
+    mode = f"pre{settings.OCR_MAX_SIDE}" if settings.OCR_PREPROCESS else "raw"
+    return f"{sha256_hex}:{mode}"
+
+
+def content_hash(image_bytes: bytes) -> str:
+    """Хеш файла как есть — быстрый путь для повторной отправки того же файла."""
+    return cache_key(hashlib.sha256(image_bytes).hexdigest())
+
+
+def image_hash(arr: "np.ndarray") -> str:
+    """Хеш декодированной картинки (decode_image): та же фотография, пересохранённая
+    без потерь или с другими метаданными/EXIF, даёт тот же ключ."""
+    h = hashlib.sha256(f"{arr.shape}:{arr.dtype}".encode())
+    h.update(arr.tobytes())
+    return cache_key(h.hexdigest())
+
+
+def get(digest: str) -> tuple[str, list[dict]] | None:
+    if not settings.OCR_CACHE_ENABLED:
+        return None
+    try:
+        r = get_redis()
+        raw = r.get(KEY_PREFIX + digest)
+        r.hincrby(STATS_KEY, "hits" if raw is not None else "misses", 1)
+    except redis.RedisError as e:
+        # кеш не должен ломать OCR
+        log.warning("ocr cache get failed: %s", e)
+        return None
+    if raw is None:
+        return None
+    data = json.loads(raw)
+    return data["raw_text"], data["items"]
+
+
+def put(digest: str, raw_text: str, items: list[dict], aliases: tuple[str | None, ...] = ()) -> None:
+    """aliases — доп. ключи на тот же результат (хеш файла рядом с хешем картинки)."""
+    if not settings.OCR_CACHE_ENABLED:
+        return
+    keys = list(dict.fromkeys(d for d in (digest, *aliases) if d))
+    payload = json.dumps({"raw_text": raw_text, "items": items})
+    now = time.time()
+    try:
+        r = get_redis()
+        pipe = r.pipeline()
+        for d in keys:
+            pipe.set(KEY_PREFIX + d, payload, ex=settings.OCR_CACHE_TTL)
+        # ключи, истёкшие по TTL, из индекса иначе не уходят — и счётчик, и вытеснение уползают
+        pipe.zremrangebyscore(INDEX_KEY, "-inf", now - settings.OCR_CACHE_TTL)
+        pipe.zadd(INDEX_KEY, {d: now for d in keys})
+        pipe.zcard(INDEX_KEY)
+        *_, size = pipe.execute()
+
+        extra = size - settings.OCR_CACHE_MAX_ENTRIES
+        if extra > 0:
+            old = [d.decode() for d, _ in r.zpopmin(INDEX_KEY, extra)]
+            if old:
+                r.delete(*(KEY_PREFIX + d for d in old))
+    except redis.RedisError as e:
+        log.warning("ocr cache put failed: %s", e)
+
+
+def stats() -> dict[str, int]:
+    r = get_redis()
+    raw = r.hgetall(STATS_KEY)
+    return {
+        "hits": int(raw.get(b"hits", 0)),
+        "misses": int(raw.get(b"misses", 0)),
+        "entries": int(r.zcard(INDEX_KEY)),
+    }
@@ -0,0 +1,50 @@
+import logging
+import time
+
+import redis
+
+from app.core.redis_client import get_async_redis, get_redis
+
+log = logging.getLogger(__name__)
+
+
+def _channel(receipt_id: int) -> str:
+    return f"ocr:done:{receipt_id}"
+
+
+def publish_done(receipt_id: int, status: str) -> None:
+    """Воркер: OCR по чеку закончился (parsed / failed)."""
+    try:
+        get_redis().publish(_channel(receipt_id), status)
+    except redis.RedisError as e:
+        # без события клиент просто дождётся таймаута и перечитает статус
+        log.warning("ocr done publish failed for receipt=%s: %s", receipt_id, e)
+
+
+class Waiter:
+    """Подписка на завершение OCR. Подписываемся ДО проверки статуса в БД, чтобы не пропустить событие."""
+
+    def __init__(self, receipt_id: int) -> None:
+        self._channel = _channel(receipt_id)
+        self._pubsub = get_async_redis().pubsub()
+
+    async def __aenter__(self) -> "Waiter":
+        await self._pubsub.subscribe(self._channel)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        try:
+            await self._pubsub.unsubscribe(self._channel)
+        finally:
+            await self._pubsub.aclose()
+
+    async def wait(self, timeout: float) -> str | None:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if msg is not None and msg.get("type") == "message":
+                data = msg["data"]
+                return data.decode() if isinstance(data, bytes) else str(data)
@@ -1,13 +1,21 @@
 import io
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Iterable, List, Tuple
 
+import cv2
 import numpy as np
 from PIL import Image
 from celery.utils.log import get_task_logger
-from rapidocr import RapidOCR
 
-_OCR = RapidOCR()
+from app.core.config import settings
+from app.services.ocr_preprocess import preprocess as _preprocess
+
+# движок создаётся лениво: в воркере — на worker_process_init, в API — никогда
+_OCR = None
+_OCR_LOCK = threading.Lock()
 
 INT_RE = re.compile(r"^\d+$")
 FLT_RE = re.compile(r"^\d+[.,]\d+$")
@@ -19,6 +27,37 @@ SKIP_TOKENS = {
     "bcero:", "всего:",
 }
 
+def _build_engine():
+    from rapidocr import RapidOCR
+
+    return RapidOCR(params={
+        # распознавание строк идёт батчами внутри одного изображения
+        "Rec.rec_batch_num": settings.OCR_REC_BATCH,
+        "EngineConfig.onnxruntime.intra_op_num_threads": settings.OCR_INTRA_OP_THREADS,
+        "EngineConfig.onnxruntime.inter_op_num_threads": settings.OCR_INTER_OP_THREADS,
+    })
+
+def _warmup(engine) -> None:
+    # маленькая картинка с текстом, чтобы прогрелись и детекция, и распознавание
+    img = np.full((48, 200, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "12 1.00 450.00", (4, 32), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+    engine(img)
+
+def init_engine():
+    global _OCR
+    with _OCR_LOCK:
+        if _OCR is None:
+            t = time.perf_counter()
+            engine = _build_engine()
+            if settings.OCR_WARMUP:
+                _warmup(engine)
+            _OCR = engine
+            get_task_logger(__name__).info("ocr engine ready in %.0fms", (time.perf_counter() - t) * 1000)
+    return _OCR
+
+def _engine():
+    return _OCR if _OCR is not None else init_engine()
+
 def _norm_token(s: str) -> str:
     s = str(s).strip().replace("\u00a0", " ").strip()
     return s.replace(",", ".")
@@ -82,22 +121,73 @@ def tokens_to_items(tokens: Iterable[str]) -> List[Dict[str, Any]]:
 
     return items
 
-def _rapidocr_tokens_from_bytes(image_bytes: bytes) -> tuple[str, tuple[str] | None]:
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    arr = np.array(img)
+def _decode(image_bytes: bytes, preprocess: bool | None = None) -> np.ndarray:
+    if preprocess is None:
+        preprocess = settings.OCR_PREPROCESS
+
+    if not preprocess:
+        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        return np.array(img)
+
+    arr, timings = _preprocess(image_bytes, settings.OCR_MAX_SIDE)
+    logger = get_task_logger(__name__)
+    logger.info("preprocess %sx%s %s", arr.shape[1], arr.shape[0],
+                " ".join(f"{k}={v:.1f}ms" for k, v in timings.items()))
+    return arr
 
-    out = _OCR(arr)
+def _rapidocr_tokens(arr: np.ndarray) -> tuple[str, tuple[str, ...]]:
+    t = time.perf_counter()
+    out = _engine()(arr)
     logger = get_task_logger(__name__)
-    logger.info(out.txts)
+    logger.info("ocr=%.1fms %s", (time.perf_counter() - t) * 1000, out.txts)
 
-    tokens = out.txts
+    tokens = out.txts or ()
 
     raw_text = "\n".join(tokens)
 
     return raw_text, tokens
 
-def run_ocr_and_parse(image_bytes: bytes) -> tuple[str, list[dict]]:
-    raw_text, tokens = _rapidocr_tokens_from_bytes(image_bytes)
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """Картинка ровно в том виде, в котором её получит OCR (с предобработкой, если включена)."""
+    return _decode(image_bytes)
+
+def _rapidocr_tokens_from_bytes(image_bytes: bytes, preprocess: bool | None = None) -> tuple[str, tuple[str, ...]]:
+    return _rapidocr_tokens(_decode(image_bytes, preprocess))
+
+def run_ocr_and_parse(image: bytes | np.ndarray, *, preprocess: bool | None = None) -> tuple[str, list[dict]]:
+    """image — байты файла или уже декодированный decode_image() массив.
+
+    preprocess=None — берём OCR_PREPROCESS из настроек; True/False — принудительно (для сравнения).
+    """
+    if isinstance(image, np.ndarray):
+        raw_text, tokens = _rapidocr_tokens(image)
+    else:
+        raw_text, tokens = _rapidocr_tokens_from_bytes(image, preprocess)
     items = tokens_to_items(tokens)
 
     return raw_text, items
+
+def _map_batch(fn, items: list) -> list:
+    """fn по каждому элементу в OCR_BATCH_WORKERS потоках; исключение — на месте результата."""
+    def _one(x):
+        try:
+            return fn(x)
+        except Exception as e:
+            return e
+
+    if len(items) <= 1:
+        return [_one(x) for x in items]
+
+    workers = max(1, min(settings.OCR_BATCH_WORKERS, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_one, items))
+
+def decode_images(images: list[bytes]) -> list[np.ndarray | Exception]:
+    """decode_image для пачки; PIL/OpenCV отпускают GIL, так что параллельно."""
+    return _map_batch(decode_image, images)
+
+def run_ocr_and_parse_batch(images: list[bytes | np.ndarray]) -> list[tuple[str, list[dict]] | Exception]:
+    """OCR для пачки фото. Результат по индексу входа; если фото упало — на его месте исключение."""
+    # onnxruntime отпускает GIL в session.run, поэтому детекция разных фото
+    # реально идёт параллельно, а распознавание строк батчится самим RapidOCR
+    return _map_batch(run_ocr_and_parse, images)
@@ -0,0 +1,62 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+import redis
+
+from app.core.metrics import LATENCY_BUCKETS, histogram_lines
+from app.core.redis_client import get_redis
+
+log = logging.getLogger(__name__)
+
+# воркер пишет длительности стадий OCR в Redis, API читает их при скрейпе /metrics
+STAGE_KEY = "metrics:ocr_stage"
+BUCKETS = LATENCY_BUCKETS + (30.0, 60.0)
+
+
+def observe(stage: str, seconds: float) -> None:
+    try:
+        p = get_redis().pipeline(transaction=False)
+        p.hincrby(STAGE_KEY, f"{stage}|count", 1)
+        p.hincrbyfloat(STAGE_KEY, f"{stage}|sum", seconds)
+        # бакеты храним сразу кумулятивными
+        for b in BUCKETS:
+            if seconds <= b:
+                p.hincrby(STAGE_KEY, f"{stage}|le|{b}", 1)
+        p.execute()
+    except redis.RedisError as e:
+        log.warning("ocr metrics observe failed: %s", e)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - t)
+
+
+def collect() -> list[str]:
+    name = "ocr_stage_duration_seconds"
+    try:
+        raw = get_redis().hgetall(STAGE_KEY)
+    except redis.RedisError as e:
+        log.warning("ocr metrics collect failed: %s", e)
+        return []
+
+    by_stage: dict[str, dict[str, str]] = {}
+    for k, v in raw.items():
+        k = k.decode() if isinstance(k, bytes) else k
+        v = v.decode() if isinstance(v, bytes) else v
+        stage, _, rest = k.partition("|")
+        by_stage.setdefault(stage, {})[rest] = v
+
+    lines = [f"# HELP {name} OCR task duration by stage", f"# TYPE {name} histogram"]
+    for stage, f in sorted(by_stage.items()):
+        cumulative = [int(f.get(f"le|{b}", 0)) for b in BUCKETS]
+        lines += histogram_lines(
+            name, ("stage",), (stage,), BUCKETS, cumulative, float(f.get("sum", 0)), int(f.get("count", 0)),
+        )
+    return lines
@@ -0,0 +1,80 @@
+import time
+
+import cv2
+import numpy as np
+
+# доля кадра, которую должен занимать найденный контур, чтобы считать его чеком
+MIN_PAPER_AREA = 0.2
+# углы меньше этого не выравниваем — поворот дороже, чем польза
+MIN_SKEW_DEG = 0.5
+
+
+def _decode_gray(image_bytes: bytes) -> np.ndarray:
+    buf = np.frombuffer(image_bytes, dtype=np.uint8)
+    img = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError("cannot decode image")
+    return img
+
+
+def _downscale(img: np.ndarray, max_side: int) -> np.ndarray:
+    h, w = img.shape[:2]
+    side = max(h, w)
+    if max_side <= 0 or side <= max_side:
+        return img
+    scale = max_side / side
+    return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+
+def _paper_rect(img: np.ndarray):
+    # чек — самое большое светлое пятно в кадре
+    blur = cv2.GaussianBlur(img, (5, 5), 0)
+    _, mask = cv2.threshold(blur, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+
+    c = max(contours, key=cv2.contourArea)
+    if cv2.contourArea(c) < MIN_PAPER_AREA * img.shape[0] * img.shape[1]:
+        return None
+    return cv2.minAreaRect(c)
+
+
+def _crop_deskew(img: np.ndarray) -> np.ndarray:
+    rect = _paper_rect(img)
+    if rect is None:
+        return img
+
+    (cx, cy), (w, h), angle = rect
+    # minAreaRect отдаёт угол в (0, 90]; приводим к ближайшему к нулю
+    if angle > 45:
+        angle -= 90
+        w, h = h, w
+
+    if abs(angle) >= MIN_SKEW_DEG:
+        m = cv2.getRotationMatrix2D((cx, cy), angle, 1.0)
+        img = cv2.warpAffine(
+            img, m, (img.shape[1], img.shape[0]),
+            flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE,
+        )
+
+    return cv2.getRectSubPix(img, (int(w), int(h)), (cx, cy))
+
+
+def preprocess(image_bytes: bytes, max_side: int) -> tuple[np.ndarray, dict[str, float]]:
+    """bytes -> серое, уменьшенное, обрезанное по бумаге изображение + тайминги стадий (мс)."""
+    timings: dict[str, float] = {}
+
+    t = time.perf_counter()
+    img = _decode_gray(image_bytes)
+    timings["decode"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    img = _downscale(img, max_side)
+    timings["downscale"] = (time.perf_counter() - t) * 1000
+
+    t = time.perf_counter()
+    img = _crop_deskew(img)
+    timings["crop_deskew"] = (time.perf_counter() - t) * 1000
+
+    return img, timings
@@ -0,0 +1,76 @@
+import json
+import time
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.worker import celery_app
+
+PENDING_KEY = "ocr:pending"
+# reliable queue: взятые воркером задачи лежат тут до ack; умер воркер — задачу вернёт requeue_stale
+PROCESSING_KEY = "ocr:processing"
+# payload -> время взятия (unix), по нему находим зависшие
+CLAIMED_KEY = "ocr:processing:claimed"
+
+Job = tuple[int, str, str | None]
+
+
+def enqueue(receipt_id: int, object_key: str, sha256: str | None = None) -> None:
+    # задачи отправляем по имени — API не должен импортировать OCR-модули
+    if not settings.OCR_BATCH_MODE:
+        celery_app.send_task("app.tasks.ocr_tasks.ocr_process_receipt", args=[receipt_id, object_key, sha256])
+        return
+
+    get_redis().rpush(PENDING_KEY, json.dumps([receipt_id, object_key, sha256]))
+    celery_app.send_task("app.tasks.ocr_tasks.ocr_drain_pending")
+
+
+def _parse(raw: bytes | str) -> Job:
+    receipt_id, object_key, *rest = json.loads(raw)
+    return int(receipt_id), object_key, rest[0] if rest else None
+
+
+def pop_pending(limit: int) -> list[tuple[Job, bytes]]:
+    """Забирает до limit задач: LMOVE pending -> processing. Каждую нужно подтвердить ack(raw)."""
+    r = get_redis()
+    p = r.pipeline(transaction=False)
+    for _ in range(limit):
+        p.lmove(PENDING_KEY, PROCESSING_KEY, "LEFT", "RIGHT")
+    raw = [x for x in p.execute() if x is not None]
+    if raw:
+        now = time.time()
+        r.hset(CLAIMED_KEY, mapping={x: now for x in raw})
+    return [(_parse(x), x) for x in raw]
+
+
+def ack(raw: bytes) -> None:
+    """Задача доведена до конца (результат записан или передана одиночной задаче)."""
+    p = get_redis().pipeline()
+    p.lrem(PROCESSING_KEY, 1, raw)
+    p.hdel(CLAIMED_KEY, raw)
+    p.execute()
+
+
+def requeue_stale() -> int:
+    """Возвращает в pending задачи, висящие в processing дольше OCR_PROCESSING_STALE_SEC."""
+    r = get_redis()
+    deadline = time.time() - settings.OCR_PROCESSING_STALE_SEC
+    moved = 0
+    for raw in r.lrange(PROCESSING_KEY, 0, -1):
+        claimed = r.hget(CLAIMED_KEY, raw)
+        if claimed is None:
+            # взята между LMOVE и HSET — отсчёт с текущего момента
+            r.hsetnx(CLAIMED_KEY, raw, time.time())
+            continue
+        if float(claimed) > deadline:
+            continue
+        # 0 — воркер успел сделать ack, возвращать нечего
+        if not r.lrem(PROCESSING_KEY, 1, raw):
+            continue
+        p = r.pipeline()
+        p.hdel(CLAIMED_KEY, raw)
+        p.rpush(PENDING_KEY, raw)
+        p.execute()
+        moved += 1
+    if moved:
+        celery_app.send_task("app.tasks.ocr_tasks.ocr_drain_pending")
+    return moved
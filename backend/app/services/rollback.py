@@ -1,73 +1,57 @@
 from decimal import Decimal
 
 from fastapi import HTTPException
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.enums import ReceiptStatus
-from app.models.inventory import Inventory
 from app.models.inventory_movement import InventoryMovement
 from app.models.receipt import Receipt
+from app.services.apply import apply_deltas, lock_inventory
 
 
-def rollback_receipt(db: Session, *, receipt_id: int, user_id) -> Receipt:
-    receipt = db.get(Receipt, receipt_id)
+async def rollback_receipt(db: AsyncSession, *, receipt_id: int, user_id) -> Receipt:
+    # commit/rollback делает вызывающий через unit_of_work
+    receipt = (
+        await db.execute(select(Receipt).where(Receipt.id == receipt_id).with_for_update())
+    ).scalar_one_or_none()
     if not receipt:
         raise HTTPException(404, detail={"error": "not_found", "message": "receipt not found"})
     if receipt.status != ReceiptStatus.applied:
         raise HTTPException(409, detail={"error": "conflict", "message": "receipt is not applied"})
 
-    orig = (
-        db.query(InventoryMovement)
-        .filter(InventoryMovement.source_receipt_id == receipt_id)
-        .order_by(InventoryMovement.id.asc())
-        .all()
-    )
-    if not orig:
+    # компенсация = -SUM(qty_delta) по движениям чека начиная с последнего apply.
+    # Раньше rollback писал компенсации с source_receipt_id=NULL, поэтому сумма по всей
+    # истории чека посчитала бы все прошлые apply без их откатов — режем по applied_at.
+    # Считаем в numeric в БД — без float и накопления ошибки в on_hand_qty
+    filters = [InventoryMovement.source_receipt_id == receipt_id]
+    if receipt.applied_at is not None:
+        filters.append(InventoryMovement.created_at >= receipt.applied_at)
+    rows = (
+        await db.execute(
+            select(InventoryMovement.ingredient_id, -func.sum(InventoryMovement.qty_delta))
+            .where(*filters)
+            .group_by(InventoryMovement.ingredient_id)
+        )
+    ).all()
+    if not rows:
         raise HTTPException(409, detail={"error": "conflict", "message": "no movements to rollback"})
 
-    ing_ids = sorted({m.ingredient_id for m in orig})
-
-    with db.begin_nested():
-        # lock receipt
-        db.execute(select(Receipt.id).where(Receipt.id == receipt_id).with_for_update())
-
-        # lock inventory rows
-        inv_rows = (
-            db.execute(
-                select(Inventory)
-                .where(Inventory.ingredient_id.in_(ing_ids))
-                .with_for_update()
-            )
-            .scalars()
-            .all()
-        )
-        inv_map = {inv.ingredient_id: inv for inv in inv_rows}
-        missing_inv = [i for i in ing_ids if i not in inv_map]
+    deltas: dict[tuple[int, int], Decimal] = {(receipt_id, ing_id): d for ing_id, d in rows if d != 0}
+    ing_ids = sorted(ing_id for _, ing_id in deltas)
+    if ing_ids:
+        locked = await lock_inventory(db, ing_ids)
+        missing_inv = [i for i in ing_ids if i not in locked]
         if missing_inv:
             raise HTTPException(
                 409,
                 detail={"error": "inventory_missing", "message": "inventory row missing for ingredient", "ingredient_ids": missing_inv},
             )
 
-        # compensate
-        for m in orig:
-            comp_delta = -float(m.qty_delta)
-            db.add(
-                InventoryMovement(
-                    ingredient_id=m.ingredient_id,
-                    qty_delta=comp_delta,
-                    source_receipt_id=None,
-                    created_by=user_id,
-                )
-            )
-            inv = inv_map[m.ingredient_id]
-            inv.on_hand_qty = inv.on_hand_qty + Decimal(comp_delta)
-            db.add(inv)
-
-        receipt.status = ReceiptStatus.edited
-        db.add(receipt)
+        # компенсирующие движения привязаны к исходному чеку
+        await apply_deltas(db, deltas, user_id)
 
-    db.commit()
-    db.refresh(receipt)
+    receipt.status = ReceiptStatus.edited
+    receipt.applied_at = None
+    db.add(receipt)
     return receipt
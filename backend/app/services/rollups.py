@@ -0,0 +1,39 @@
+from sqlalchemy import Date, case, cast, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory_daily_rollup import InventoryDailyRollup
+from app.models.inventory_movement import InventoryMovement
+
+M = InventoryMovement
+R = InventoryDailyRollup
+
+consumed_expr = case((M.qty_delta < 0, -M.qty_delta), else_=0)
+received_expr = case((M.qty_delta > 0, M.qty_delta), else_=0)
+
+
+async def record_movements(db: AsyncSession, movement_ids: list[int]) -> None:
+    """Добавляет только что вставленные движения в суточные итоги (в той же транзакции).
+
+    Вызывается с уже залоченными строками inventory этих ингредиентов, поэтому
+    конкурентные upsert по одному (ingredient_id, day) идут строго друг за другом.
+    """
+    if not movement_ids:
+        return
+
+    day = cast(M.created_at, Date)
+    sel = (
+        select(M.ingredient_id, day, func.sum(consumed_expr), func.sum(received_expr))
+        .where(M.id.in_(movement_ids))
+        .group_by(M.ingredient_id, day)
+        .order_by(M.ingredient_id, day)
+    )
+    stmt = insert(R).from_select([R.ingredient_id, R.day, R.consumed, R.received], sel)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[R.ingredient_id, R.day],
+        set_={
+            "consumed": R.consumed + stmt.excluded.consumed,
+            "received": R.received + stmt.excluded.received,
+        },
+    )
+    await db.execute(stmt)
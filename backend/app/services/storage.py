@@ -1,4 +1,8 @@
+import hashlib
+from typing import BinaryIO
+
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 
 from app.core.config import settings
@@ -8,15 +12,58 @@ _s3 = boto3.client(
     endpoint_url=settings.S3_ENDPOINT,
     aws_access_key_id=settings.S3_ACCESS_KEY,
     aws_secret_access_key=settings.S3_SECRET_KEY,
-    config=Config(signature_version="s3v4"),
+    config=Config(
+        signature_version="s3v4",
+        # один клиент на процесс: keep-alive соединения переиспользуются между загрузками
+        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+        retries={"max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "standard"},
+        tcp_keepalive=True,
+        connect_timeout=settings.S3_CONNECT_TIMEOUT,
+        read_timeout=settings.S3_READ_TIMEOUT,
+    ),
     region_name="us-east-1",
 )
 
+# бакет проверяем один раз на процесс (на старте), а не перед каждой загрузкой
+_bucket_ready = False
+
+# большие файлы уходят multipart-ом, кусками по 8 МБ — в памяти не больше пары кусков
+_transfer = TransferConfig(multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024)
+
+
+class ObjectTooLarge(ValueError):
+    pass
+
+
+class _HashingReader:
+    """Обёртка над файлом: считает размер и sha256 по мере чтения, режет по лимиту."""
+
+    def __init__(self, f: BinaryIO, max_bytes: int) -> None:
+        self._f = f
+        self._max_bytes = max_bytes
+        self._sha = hashlib.sha256()
+        self.size = 0
+
+    def read(self, n: int = -1) -> bytes:
+        chunk = self._f.read(n)
+        self.size += len(chunk)
+        if self.size > self._max_bytes:
+            raise ObjectTooLarge(f"object exceeds {self._max_bytes} bytes")
+        self._sha.update(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._sha.hexdigest()
+
 def ensure_bucket():
+    global _bucket_ready
+    if _bucket_ready:
+        return
     try:
         _s3.head_bucket(Bucket=settings.S3_BUCKET)
     except Exception:
         _s3.create_bucket(Bucket=settings.S3_BUCKET)
+    _bucket_ready = True
 
 def put_object(key: str, data: bytes, content_type: str | None = None):
     ensure_bucket()
@@ -25,6 +72,16 @@ def put_object(key: str, data: bytes, content_type: str | None = None):
         extra["ContentType"] = content_type
     _s3.put_object(Bucket=settings.S3_BUCKET, Key=key, Body=data, **extra)
 
+def put_stream(key: str, f: BinaryIO, content_type: str | None = None, max_bytes: int | None = None) -> tuple[int, str]:
+    """Льёт файл в S3 без чтения целиком в память. Возвращает (размер, sha256)."""
+    ensure_bucket()
+    extra = {}
+    if content_type:
+        extra["ContentType"] = content_type
+    reader = _HashingReader(f, max_bytes if max_bytes is not None else settings.RECEIPT_MAX_UPLOAD_BYTES)
+    _s3.upload_fileobj(reader, settings.S3_BUCKET, key, ExtraArgs=extra or None, Config=_transfer)
+    return reader.size, reader.hexdigest()
+
 def get_object(key: str) -> bytes:
     resp = _s3.get_object(Bucket=settings.S3_BUCKET, Key=key)
     return resp["Body"].read()
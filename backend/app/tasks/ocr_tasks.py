@@ -1,15 +1,21 @@
+import time
 from datetime import datetime
+from typing import Callable
+
 from celery.utils.log import get_task_logger
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.db.session import SessionLocal
 from app.models.enums import ReceiptStatus
 from app.models.receipt import Receipt
 from app.models.receipt_item import ReceiptItem
+from app.services import catalog, ocr_cache, ocr_events, ocr_metrics
 from app.services.storage import get_object, delete_object
+from app.services import ocr_queue
 from app.worker import celery_app
-from app.services.ocr_impl import run_ocr_and_parse
+from app.services.ocr_impl import decode_image, decode_images, run_ocr_and_parse, run_ocr_and_parse_batch
 
 logger = get_task_logger(__name__)
 
@@ -18,77 +24,228 @@ def _now():
     return datetime.utcnow()
 
 
-@celery_app.task(bind=True, name="app.tasks.ocr_tasks.ocr_process_receipt", autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 5})
-def ocr_process_receipt(self, receipt_id: int, object_key: str):
-    db: Session = SessionLocal()
-    try:
-        # lock receipt (чтобы 2 воркера не работали одновременно)
-        with db.begin():
-            r = db.execute(
-                select(Receipt).where(Receipt.id == receipt_id).with_for_update()
-            ).scalar_one_or_none()
-
-            if not r:
-                logger.warning("receipt not found: %s", receipt_id)
-                return
-
-            # если уже applied — ничего не делаем
-            if r.status == ReceiptStatus.applied:
-                return
-
-            r.status = ReceiptStatus.processing
-            r.ocr_started_at = _now()
-            r.ocr_error = None
+def _mark_processing(db: Session, receipt_id: int) -> bool:
+    # lock receipt (чтобы 2 воркера не работали одновременно)
+    with db.begin():
+        r = db.execute(
+            select(Receipt).where(Receipt.id == receipt_id).with_for_update()
+        ).scalar_one_or_none()
+
+        if not r:
+            logger.warning("receipt not found: %s", receipt_id)
+            return False
+
+        # если уже applied — ничего не делаем
+        if r.status == ReceiptStatus.applied:
+            return False
+
+        r.status = ReceiptStatus.processing
+        r.ocr_started_at = _now()
+        r.ocr_error = None
+        db.add(r)
+    return True
+
+
+def _store_result(db: Session, receipt_id: int, raw_text: str, parsed_items: list[dict]) -> None:
+    with db.begin():
+        r = db.execute(select(Receipt).where(Receipt.id == receipt_id).with_for_update()).scalar_one()
+
+        # перезапись результатов OCR: удаляем старые items (источник истины)
+        db.query(ReceiptItem).filter(ReceiptItem.receipt_id == receipt_id).delete()
+
+        r.raw_text = raw_text
+        r.status = ReceiptStatus.parsed
+        r.ocr_finished_at = _now()
+        db.add(r)
+
+        # матчим сразу здесь — позиции приходят в бот уже с product_id
+        code_map = catalog.product_code_map(db)
+
+        db.add_all([
+            ReceiptItem(
+                receipt_id=receipt_id,
+                product_code_raw=it["product_code_raw"],
+                qty=it["qty"],
+                unit_price=it.get("unit_price"),
+                line_total=it.get("line_total"),
+                product_id=code_map.get(catalog.normalize_code(it["product_code_raw"])),
+                is_deleted=False,
+            )
+            for it in parsed_items
+        ])
+
+    ocr_events.publish_done(receipt_id, ReceiptStatus.parsed.value)
+
+
+def _mark_failed(db: Session, receipt_id: int, error: Exception) -> None:
+    with db.begin():
+        r = db.execute(select(Receipt).where(Receipt.id == receipt_id).with_for_update()).scalar_one_or_none()
+        if r:
+            r.status = ReceiptStatus.failed
+            r.ocr_error = str(error)
+            r.ocr_finished_at = _now()
             db.add(r)
 
-        # скачать фото
-        image_bytes = get_object(object_key)
-        logger.info("downloaded bytes=%s", len(image_bytes))
-
-        # OCR (пока заглушка, но структура продовая)
-        raw_text, parsed_items = run_ocr_and_parse(image_bytes)
-
+    ocr_events.publish_done(receipt_id, ReceiptStatus.failed.value)
 
-        with db.begin():
-            r = db.execute(select(Receipt).where(Receipt.id == receipt_id).with_for_update()).scalar_one()
 
-            # перезапись результатов OCR: удаляем старые items (источник истины)
-            db.query(ReceiptItem).filter(ReceiptItem.receipt_id == receipt_id).delete()
-
-            r.raw_text = raw_text
-            r.status = ReceiptStatus.parsed
-            r.ocr_finished_at = _now()
-            db.add(r)
-
-            db.add_all([
-                ReceiptItem(
-                    receipt_id=receipt_id,
-                    product_code_raw=it["product_code_raw"],
-                    qty=it["qty"],
-                    unit_price=it.get("unit_price"),
-                    line_total=it.get("line_total"),
-                    product_id=None,
-                    is_deleted=False,
-                )
-                for it in parsed_items
-            ])
+@celery_app.task(bind=True, name="app.tasks.ocr_tasks.ocr_process_receipt", autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 5})
+def ocr_process_receipt(self, receipt_id: int, object_key: str, sha256: str | None = None):
+    db: Session = SessionLocal()
+    started = time.perf_counter()
+    try:
+        if not _mark_processing(db, receipt_id):
+            return
+
+        # хеш посчитан API при загрузке — при попадании в кеш фото даже не качаем
+        file_digest = ocr_cache.cache_key(sha256) if sha256 else None
+        cached = ocr_cache.get(file_digest) if file_digest else None
+
+        if cached is not None:
+            logger.info("ocr cache hit receipt=%s", receipt_id)
+        else:
+            # скачать фото
+            with ocr_metrics.timed("download"):
+                image_bytes = get_object(object_key)
+            logger.info("downloaded bytes=%s", len(image_bytes))
+
+            if file_digest is None:
+                file_digest = ocr_cache.content_hash(image_bytes)
+                cached = ocr_cache.get(file_digest)
+            if cached is None:
+                # промах по файлу — сверяемся по декодированной картинке (тот же снимок, пересохранённый)
+                with ocr_metrics.timed("decode"):
+                    image = decode_image(image_bytes)
+                digest = ocr_cache.image_hash(image)
+                cached = ocr_cache.get(digest)
+                if cached is None:
+                    with ocr_metrics.timed("ocr"):
+                        cached = run_ocr_and_parse(image)
+                ocr_cache.put(digest, *cached, aliases=(file_digest,))
+        raw_text, parsed_items = cached
+
+        with ocr_metrics.timed("store"):
+            _store_result(db, receipt_id, raw_text, parsed_items)
 
         # можно удалить файл сразу
         delete_object(object_key)
+        ocr_metrics.observe("total", time.perf_counter() - started)
 
     except Exception as e:
         # записать failed
         try:
-            with db.begin():
-                r = db.execute(select(Receipt).where(Receipt.id == receipt_id).with_for_update()).scalar_one_or_none()
-                if r:
-                    r.status = ReceiptStatus.failed
-                    r.ocr_error = str(e)
-                    r.ocr_finished_at = _now()
-                    db.add(r)
+            _mark_failed(db, receipt_id, e)
         finally:
             db.close()
         raise
     finally:
         db.close()
 
+
+def _process_batch(
+    jobs: list[tuple[int, str, str | None]], done: Callable[[int, str], None] = lambda *_: None
+) -> None:
+    """done(receipt_id, object_key) — задача закрыта: результат записан или передан одиночной задаче."""
+    db: Session = SessionLocal()
+    try:
+        # повторы из кеша не гоняем через OCR (и по возможности не качаем)
+        results: dict[int, tuple[str, list[dict]] | Exception] = {}
+        file_digests: dict[int, str] = {}
+        files: dict[int, bytes] = {}
+        ready: list[tuple[int, str, str | None]] = []
+        for receipt_id, object_key, sha256 in jobs:
+            try:
+                if not _mark_processing(db, receipt_id):
+                    done(receipt_id, object_key)
+                    continue
+                cached = None
+                if sha256:
+                    file_digests[receipt_id] = ocr_cache.cache_key(sha256)
+                    cached = ocr_cache.get(file_digests[receipt_id])
+                if cached is None:
+                    with ocr_metrics.timed("download"):
+                        files[receipt_id] = get_object(object_key)
+                    if not sha256:
+                        file_digests[receipt_id] = ocr_cache.content_hash(files[receipt_id])
+                        cached = ocr_cache.get(file_digests[receipt_id])
+                if cached is not None:
+                    files.pop(receipt_id, None)
+                    results[receipt_id] = cached
+                ready.append((receipt_id, object_key, sha256))
+            except Exception as e:
+                logger.warning("batch: receipt %s not loaded (%s), fallback to single task", receipt_id, e)
+                ocr_process_receipt.delay(receipt_id, object_key, sha256)
+                done(receipt_id, object_key)
+
+        if not ready:
+            return
+
+        # промахи по файлу — декодируем и сверяемся по хешу картинки
+        digests: dict[int, str] = {}
+        images = {}
+        if files:
+            with ocr_metrics.timed("decode"):
+                decoded = decode_images(list(files.values()))
+            for receipt_id, image in zip(files, decoded):
+                if isinstance(image, Exception):
+                    results[receipt_id] = image
+                    continue
+                digests[receipt_id] = ocr_cache.image_hash(image)
+                cached = ocr_cache.get(digests[receipt_id])
+                if cached is not None:
+                    results[receipt_id] = cached
+                    ocr_cache.put(digests[receipt_id], *cached, aliases=(file_digests.get(receipt_id),))
+                else:
+                    images[receipt_id] = image
+
+        todo = list(images)
+        if todo:
+            with ocr_metrics.timed("ocr_batch"):
+                batch = run_ocr_and_parse_batch([images[i] for i in todo])
+            for receipt_id, res in zip(todo, batch):
+                results[receipt_id] = res
+                if not isinstance(res, Exception):
+                    ocr_cache.put(digests[receipt_id], *res, aliases=(file_digests.get(receipt_id),))
+        logger.info("batch: ocr done for %s receipts (%s from cache)", len(ready), len(ready) - len(todo))
+
+        for receipt_id, object_key, sha256 in ready:
+            res = results[receipt_id]
+            try:
+                if isinstance(res, Exception):
+                    raise res
+                raw_text, parsed_items = res
+                with ocr_metrics.timed("store"):
+                    _store_result(db, receipt_id, raw_text, parsed_items)
+                delete_object(object_key)
+            except Exception as e:
+                # одиночная задача сама сделает ретраи и в итоге пометит failed
+                logger.warning("batch: receipt %s failed (%s), fallback to single task", receipt_id, e)
+                ocr_process_receipt.delay(receipt_id, object_key, sha256)
+            done(receipt_id, object_key)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.ocr_tasks.ocr_process_receipt_batch")
+def ocr_process_receipt_batch(jobs: list[list]):
+    _process_batch([(int(receipt_id), object_key, rest[0] if rest else None) for receipt_id, object_key, *rest in jobs])
+
+
+@celery_app.task(name="app.tasks.ocr_tasks.ocr_drain_pending")
+def ocr_drain_pending():
+    # каждый enqueue ставит drain; первая задача забирает пачку, остальные — что осталось.
+    # Заодно подбираем задачи воркеров, умерших без рестарта (на старте это делает worker_ready)
+    ocr_queue.requeue_stale()
+    claimed = ocr_queue.pop_pending(settings.OCR_BATCH_SIZE)
+    if not claimed:
+        return
+    raw_by_job: dict[tuple[int, str], list[bytes]] = {}
+    for (receipt_id, object_key, _), raw in claimed:
+        raw_by_job.setdefault((receipt_id, object_key), []).append(raw)
+
+    def done(receipt_id: int, object_key: str) -> None:
+        # ack только после записи результата/передачи дальше: упадём раньше — задачу вернёт requeue_stale
+        for raw in raw_by_job.pop((receipt_id, object_key), []):
+            ocr_queue.ack(raw)
+
+    _process_batch([job for job, _ in claimed], done)
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_process_init, worker_ready
 from app.core.config import settings
 
 celery_app = Celery(
@@ -10,5 +11,28 @@ celery_app = Celery(
 
 celery_app.conf.task_routes = {
     "app.tasks.ocr_tasks.ocr_process_receipt": {"queue": "ocr"},
+    "app.tasks.ocr_tasks.ocr_process_receipt_batch": {"queue": "ocr"},
+    "app.tasks.ocr_tasks.ocr_drain_pending": {"queue": "ocr"},
 }
 celery_app.conf.task_default_queue = "default"
+
+
+@worker_process_init.connect
+def _init_worker_process(**_):
+    # пул БД с настройками воркера, а не API
+    from app.db.session import configure_for_worker
+
+    configure_for_worker()
+
+    # модель грузим в каждом дочернем процессе, а не при импорте модулей
+    from app.services.ocr_impl import init_engine
+
+    init_engine()
+
+
+@worker_ready.connect
+def _requeue_stale_ocr(**_):
+    # задачи, взятые упавшим воркером, иначе навсегда остались бы в processing
+    from app.services.ocr_queue import requeue_stale
+
+    requeue_stale()
@@ -0,0 +1,60 @@
+"""Накладные расходы get_current_user на запрос: без кеша (jwt.decode + SELECT, как было) и с кешем.
+
+Нужна БД из настроек (DATABASE_URL) и существующий пользователь.
+
+Запуск из backend/:
+    python -m scripts.bench_auth --user-id 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+
+async def _bench(n: int, token: str, cold: bool) -> list[float]:
+    from fastapi.security import HTTPAuthorizationCredentials
+
+    from app.core import auth
+    from app.db.session import AsyncSessionLocal
+
+    creds = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    timings = []
+    for _ in range(n):
+        if cold:
+            auth.clear_auth_cache()
+        # сессия на запрос — как в get_async_db
+        async with AsyncSessionLocal() as db:
+            t = time.perf_counter()
+            await auth.get_current_user(creds, db)
+            timings.append((time.perf_counter() - t) * 1000)
+    return timings
+
+
+def _report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<8} n={len(timings)} mean={statistics.mean(timings):.3f}ms p50={statistics.median(timings):.3f}ms p95={p95:.3f}ms")
+
+
+async def _main(n: int, user_id: int) -> None:
+    from app.core.security import create_access_token
+    from app.db.session import async_engine
+
+    token = create_access_token(sub=str(user_id), role="admin")
+    await _bench(20, token, True)  # прогрев пула соединений
+
+    _report("before", await _bench(n, token, True))
+    _report("after", await _bench(n, token, False))
+    await async_engine.dispose()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    ap.add_argument("--user-id", type=int, required=True)
+    args = ap.parse_args()
+    asyncio.run(_main(args.n, args.user_id))
+
+
+if __name__ == "__main__":
+    main()
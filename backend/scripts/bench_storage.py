@@ -0,0 +1,61 @@
+"""Латентность загрузки в S3: с head_bucket перед каждым put (как было) и без.
+
+Запуск из backend/:
+    python -m scripts.bench_storage            # MinIO из настроек (S3_ENDPOINT)
+    python -m scripts.bench_storage --moto     # moto вместо MinIO (pip install moto)
+"""
+import argparse
+import os
+import statistics
+import time
+import uuid
+
+
+def _bench(n: int, size: int, per_call_head: bool) -> list[float]:
+    from app.core.config import settings
+    from app.services import storage
+
+    data = os.urandom(size)
+    timings = []
+    for _ in range(n):
+        key = f"bench/{uuid.uuid4().hex}"
+        t = time.perf_counter()
+        if per_call_head:
+            storage._s3.head_bucket(Bucket=settings.S3_BUCKET)
+        storage.put_object(key, data, content_type="image/jpeg")
+        timings.append((time.perf_counter() - t) * 1000)
+        storage.delete_object(key)
+    return timings
+
+
+def _report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{name:<8} n={len(timings)} mean={statistics.mean(timings):.2f}ms p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=200)
+    ap.add_argument("--size", type=int, default=300 * 1024, help="bytes per upload")
+    ap.add_argument("--moto", action="store_true")
+    args = ap.parse_args()
+
+    if args.moto:
+        from moto import mock_aws
+
+        os.environ["S3_ENDPOINT"] = "https://s3.amazonaws.com"
+        mock = mock_aws()
+        mock.start()
+
+    from app.services import storage
+
+    storage.ensure_bucket()
+    _bench(10, args.size, False)  # прогрев соединений
+
+    _report("before", _bench(args.n, args.size, True))
+    _report("after", _bench(args.n, args.size, False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Сравнение OCR с предобработкой и без на наборе фото чеков.
+
+Запуск из backend/:
+    python -m scripts.ocr_compare path/to/receipts/
+
+Для каждого фото: время обоих путей и сколько позиций совпало
+(эталон — текущий путь без предобработки).
+"""
+import sys
+import time
+from pathlib import Path
+
+from app.services.ocr_impl import run_ocr_and_parse
+
+EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def _key(it: dict) -> tuple:
+    return it["product_code_raw"], it["qty"], it["unit_price"]
+
+
+def _run(image_bytes: bytes, preprocess: bool) -> tuple[float, list[dict]]:
+    t = time.perf_counter()
+    _, items = run_ocr_and_parse(image_bytes, preprocess=preprocess)
+    return (time.perf_counter() - t) * 1000, items
+
+
+def main(folder: str) -> None:
+    files = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in EXTS)
+    if not files:
+        print(f"no images in {folder}")
+        return
+
+    # прогрев, чтобы первая загрузка модели не попала в замер
+    _run(files[0].read_bytes(), False)
+
+    total_base = total_pre = 0.0
+    matched = expected = 0
+    print(f"{'file':<32} {'base ms':>9} {'pre ms':>9} {'items':>7} {'match':>7}")
+    for f in files:
+        data = f.read_bytes()
+        base_ms, base_items = _run(data, False)
+        pre_ms, pre_items = _run(data, True)
+
+        base_keys = {_key(it) for it in base_items}
+        hit = len(base_keys & {_key(it) for it in pre_items})
+
+        total_base += base_ms
+        total_pre += pre_ms
+        matched += hit
+        expected += len(base_keys)
+        print(f"{f.name[:32]:<32} {base_ms:>9.1f} {pre_ms:>9.1f} {len(pre_items):>3}/{len(base_items):<3} {hit:>7}")
+
+    n = len(files)
+    print()
+    print(f"avg base={total_base / n:.1f}ms pre={total_pre / n:.1f}ms speedup={total_base / max(total_pre, 1e-9):.2f}x")
+    print(f"items matched {matched}/{expected}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1])
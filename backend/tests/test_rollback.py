@@ -0,0 +1,80 @@
+"""rollback_receipt на реальном Postgres (схема поднята alembic upgrade head).
+
+TEST_DATABASE_URL=postgresql+psycopg://... pytest tests/
+Без TEST_DATABASE_URL тесты пропускаются. Всё делается в одной транзакции и откатывается.
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL not set", allow_module_level=True)
+os.environ.setdefault("DATABASE_URL", TEST_DATABASE_URL)
+
+from sqlalchemy import select  # noqa: E402
+
+from app.db.session import AsyncSessionLocal  # noqa: E402
+from app.models.enums import ReceiptStatus, UserRole  # noqa: E402
+from app.models.ingredient import Ingredient  # noqa: E402
+from app.models.inventory import Inventory  # noqa: E402
+from app.models.inventory_movement import InventoryMovement  # noqa: E402
+from app.models.receipt import Receipt  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.services.rollback import rollback_receipt  # noqa: E402
+
+T1 = datetime(2026, 1, 1, 10, 0)
+T2 = datetime(2026, 1, 1, 11, 0)
+T3 = datetime(2026, 1, 1, 12, 0)
+
+
+async def _rollback_after_legacy_cycle() -> tuple[Decimal, list[tuple[Decimal, int | None]]]:
+    async with AsyncSessionLocal() as db:
+        try:
+            user = User(tg_user_id=uuid.uuid4().int % 10**12, role=UserRole.operator)
+            ing = Ingredient(name=f"test-{uuid.uuid4()}")
+            db.add_all([user, ing])
+            await db.flush()
+
+            # история: apply (-2) -> старый rollback (+2, source_receipt_id=NULL) -> apply (-2)
+            db.add(Inventory(ingredient_id=ing.id, on_hand_qty=Decimal("8")))
+            receipt = Receipt(user_id=user.id, status=ReceiptStatus.applied, applied_at=T3)
+            db.add(receipt)
+            await db.flush()
+            db.add_all([
+                InventoryMovement(ingredient_id=ing.id, qty_delta=Decimal("-2"), source_receipt_id=receipt.id,
+                                  created_by=user.id, created_at=T1),
+                InventoryMovement(ingredient_id=ing.id, qty_delta=Decimal("2"), source_receipt_id=None,
+                                  created_by=user.id, created_at=T2),
+                InventoryMovement(ingredient_id=ing.id, qty_delta=Decimal("-2"), source_receipt_id=receipt.id,
+                                  created_by=user.id, created_at=T3),
+            ])
+            await db.flush()
+
+            await rollback_receipt(db, receipt_id=receipt.id, user_id=user.id)
+            await db.flush()
+
+            on_hand = (
+                await db.execute(select(Inventory.on_hand_qty).where(Inventory.ingredient_id == ing.id))
+            ).scalar_one()
+            comp = (
+                await db.execute(
+                    select(InventoryMovement.qty_delta, InventoryMovement.source_receipt_id)
+                    .where(InventoryMovement.ingredient_id == ing.id, InventoryMovement.created_at > T3)
+                )
+            ).all()
+            return on_hand, [tuple(r) for r in comp]
+        finally:
+            await db.rollback()
+
+
+def test_rollback_ignores_applies_already_undone_by_legacy_rollback():
+    on_hand, comp = asyncio.run(_rollback_after_legacy_cycle())
+    # компенсируется только последний apply: остаток возвращается к 10, а не к 12
+    assert on_hand == Decimal("10")
+    assert len(comp) == 1
+    assert comp[0][0] == Decimal("2")
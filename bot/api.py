@@ -1,166 +1,194 @@
+import logging
+import time
+from typing import Any, Callable, Optional
+
 import aiohttp
-from typing import Optional
+
+from config import API_POOL_LIMIT, API_KEEPALIVE_TIMEOUT, API_DNS_TTL
+
+log = logging.getLogger(__name__)
 
 
 class ApiClient:
     def __init__(self, base_url: str) -> None:
         self.base_url = base_url.rstrip("/")
         self.timeout = aiohttp.ClientTimeout(total=60)
+        # одна сессия на весь процесс: TCP-соединения к API переиспользуются
+        self._session: aiohttp.ClientSession | None = None
+        # op -> [кол-во вызовов, суммарное время в мс, максимум в мс]
+        self.stats: dict[str, list[float]] = {}
+        # подписчики на 401/403: получают токен, с которым API отказал
+        self._auth_error_listeners: list[Callable[[str], None]] = []
+
+    # ── lifecycle ─────────────────────────────────────────────────────────────
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=API_POOL_LIMIT,
+                keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=API_DNS_TTL,
+            )
+            self._session = aiohttp.ClientSession(timeout=self.timeout, connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def on_auth_error(self, listener: Callable[[str], None]) -> None:
+        self._auth_error_listeners.append(listener)
+
+    # ── internal ──────────────────────────────────────────────────────────────
+
+    def _record(self, op: str, ms: float) -> None:
+        st = self.stats.setdefault(op, [0, 0.0, 0.0])
+        st[0] += 1
+        st[1] += ms
+        st[2] = max(st[2], ms)
+
+    async def _send(
+        self,
+        op: str,
+        method: str,
+        path: str,
+        token: str | None = None,
+        read_body: bool = True,
+        **kwargs: Any,
+    ):
+        url = f"{self.base_url}{path}"
+        headers = kwargs.pop("headers", {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        t = time.perf_counter()
+        try:
+            async with self._get_session().request(method, url, headers=headers, **kwargs) as r:
+                data = await r.json(content_type=None) if read_body and r.status != 304 else None
+                if token and r.status in (401, 403):
+                    self._notify_auth_error(token)
+                return r.status, data, r.headers
+        finally:
+            ms = (time.perf_counter() - t) * 1000
+            self._record(op, ms)
+            log.debug("api %s %s %.1fms", method, path, ms)
+
+    def _notify_auth_error(self, token: str) -> None:
+        for listener in self._auth_error_listeners:
+            try:
+                listener(token)
+            except Exception as e:
+                log.warning("auth error listener failed: %s", e)
+
+    async def _request(self, op: str, method: str, path: str, token: str | None = None, **kwargs: Any):
+        status, data, _ = await self._send(op, method, path, token, **kwargs)
+        return status, data
+
+    async def _conditional_get(self, op: str, path: str, token: str, etag: str | None, **kwargs: Any):
+        """GET с If-None-Match. Возвращает (status, data, etag); на 304 data=None."""
+        headers = {"If-None-Match": etag} if etag else {}
+        status, data, resp_headers = await self._send(op, "GET", path, token, headers=headers, **kwargs)
+        return status, data, resp_headers.get("ETag")
+
+    def stats_summary(self) -> dict[str, dict[str, float]]:
+        return {
+            op: {"count": n, "avg_ms": round(total / n, 1) if n else 0.0, "max_ms": round(mx, 1)}
+            for op, (n, total, mx) in self.stats.items()
+        }
+
+    # ── endpoints ─────────────────────────────────────────────────────────────
 
     async def auth_telegram(self, tg_user_id: int, username: Optional[str]):
-        url = f"{self.base_url}/auth/telegram"
         payload = {"tg_user_id": tg_user_id, "username": username}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.post(url, json=payload) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("auth_telegram", "POST", "/auth/telegram", json=payload)
 
     async def create_receipt(self, token: str):
-        url = f"{self.base_url}/receipts"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.post(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("create_receipt", "POST", "/receipts", token)
 
     async def enqueue_ocr(self, token: str, receipt_id: int, file_bytes: bytes, filename: str, content_type: str):
-        url = f"{self.base_url}/receipts/{receipt_id}/ocr"
-        headers = {"Authorization": f"Bearer {token}"}
         form = aiohttp.FormData()
         form.add_field("file", file_bytes, filename=filename, content_type=content_type)
-
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.post(url, headers=headers, data=form) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("enqueue_ocr", "POST", f"/receipts/{receipt_id}/ocr", token, data=form)
 
     async def get_receipt(self, token: str, receipt_id: int):
-        url = f"{self.base_url}/receipts/{receipt_id}"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("get_receipt", "GET", f"/receipts/{receipt_id}", token)
+
+    async def get_receipt_full(self, token: str, receipt_id: int, etag: str | None = None):
+        return await self._conditional_get("get_receipt_full", f"/receipts/{receipt_id}/full", token, etag)
+
+    async def wait_receipt(self, token: str, receipt_id: int, timeout: float):
+        params = {"timeout": timeout}
+        return await self._request("wait_receipt", "GET", f"/receipts/{receipt_id}/wait", token, params=params)
 
     async def list_items(self, token: str, receipt_id: int):
-        url = f"{self.base_url}/receipts/{receipt_id}/items"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
-
-    async def list_products(self, token: str):
-        url = f"{self.base_url}/products"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("list_items", "GET", f"/receipts/{receipt_id}/items", token)
+
+    async def list_products(self, token: str, etag: str | None = None):
+        return await self._conditional_get("list_products", "/products", token, etag)
 
     async def patch_item(self, token: str, receipt_id: int, item_id: int, payload: dict):
-        url = f"{self.base_url}/receipts/{receipt_id}/items/{item_id}"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.patch(url, headers=headers, json=payload) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        path = f"/receipts/{receipt_id}/items/{item_id}"
+        return await self._request("patch_item", "PATCH", path, token, json=payload)
 
     async def apply_receipt(self, token: str, receipt_id: int):
-        url = f"{self.base_url}/receipts/{receipt_id}/apply"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.post(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("apply_receipt", "POST", f"/receipts/{receipt_id}/apply", token)
 
     async def rollback_receipt(self, token: str, receipt_id: int):
-        url = f"{self.base_url}/receipts/{receipt_id}/rollback"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.post(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("rollback_receipt", "POST", f"/receipts/{receipt_id}/rollback", token)
 
     async def create_item(self, token: str, receipt_id: int, payload: dict):
-        url = f"{self.base_url}/receipts/{receipt_id}/items"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.post(url, headers=headers, json=payload) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("create_item", "POST", f"/receipts/{receipt_id}/items", token, json=payload)
 
     async def match_item(self, token: str, receipt_id: int, item_id: int, payload: dict):
-        url = f"{self.base_url}/receipts/{receipt_id}/items/{item_id}/match"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.post(url, headers=headers, json=payload) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        path = f"/receipts/{receipt_id}/items/{item_id}/match"
+        return await self._request("match_item", "POST", path, token, json=payload)
+
+    async def auto_match(self, token: str, receipt_id: int):
+        return await self._request("auto_match", "POST", f"/receipts/{receipt_id}/auto-match", token)
 
     async def delete_item(self, token: str, receipt_id: int, item_id: int):
-        url = f"{self.base_url}/receipts/{receipt_id}/items/{item_id}"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.delete(url, headers=headers) as r:
-                return r.status, None
-
-    async def list_receipts(self, token: str, status: str | None = None, from_: str | None = None, to: str | None = None):
-        url = f"{self.base_url}/receipts"
-        headers = {"Authorization": f"Bearer {token}"}
-        params = {}
-        if status:
-            params["status"] = status
+        path = f"/receipts/{receipt_id}/items/{item_id}"
+        return await self._request("delete_item", "DELETE", path, token, read_body=False)
+
+    async def list_receipts(
+        self,
+        token: str,
+        status: list[str] | None = None,
+        status_ne: list[str] | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+        from_: str | None = None,
+        to: str | None = None,
+    ):
+        # список пар: status/status__ne передаются повторяющимися параметрами
+        params: list[tuple[str, str]] = []
+        params += [("status", st) for st in status or ()]
+        params += [("status__ne", st) for st in status_ne or ()]
+        if limit:
+            params.append(("limit", str(limit)))
+        if cursor:
+            params.append(("cursor", cursor))
         if from_:
-            params["from_"] = from_
+            params.append(("from_", from_))
         if to:
-            params["to"] = to
-
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers, params=params) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+            params.append(("to", to))
+        return await self._request("list_receipts", "GET", "/receipts", token, params=params)
 
     async def list_inventory(self, token: str):
-        url = f"{self.base_url}/inventory"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("list_inventory", "GET", "/inventory", token)
 
     async def get_inventory_item(self, token: str, ingredient_id: int):
-        url = f"{self.base_url}/inventory/{ingredient_id}"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
-
-    async def list_ingredients(self, token: str):
-        url = f"{self.base_url}/ingredients"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("get_inventory_item", "GET", f"/inventory/{ingredient_id}", token)
+
+    async def list_ingredients(self, token: str, etag: str | None = None):
+        return await self._conditional_get("list_ingredients", "/ingredients", token, etag)
 
     async def report_consumption(self, token: str, from_: str, to: str, ingredient_id: int | None = None):
-        url = f"{self.base_url}/reports/consumption"
-        headers = {"Authorization": f"Bearer {token}"}
         params = {"from_": from_, "to": to}
         if ingredient_id:
             params["ingredient_id"] = ingredient_id
-
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers, params=params) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("report_consumption", "GET", "/reports/consumption", token, params=params)
 
     async def me(self, token: str):
-        url = f"{self.base_url}/me"
-        headers = {"Authorization": f"Bearer {token}"}
-        async with aiohttp.ClientSession(timeout=self.timeout) as s:
-            async with s.get(url, headers=headers) as r:
-                data = await r.json(content_type=None)
-                return r.status, data
+        return await self._request("me", "GET", "/me", token)
@@ -1,15 +1,52 @@
+import asyncio
+import logging
 import time
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
 
-# Продукты меняются редко, но всё же меняются
+log = logging.getLogger(__name__)
+
+# Продукты меняются редко, но всё же меняются; после TTL — перепроверка по ETag в фоне
 PRODUCTS_TTL = 300       # 5 минут
 INGREDIENTS_TTL = 300    # 5 минут
+CATALOG_MAX_STALE = 3600 # дольше часа протухшее не отдаём — ждём свежее
+# последний открытый чек пользователя: держим ETag, чтобы получать 304 вместо тела
+RECEIPT_FULL_TTL = 600   # 10 минут
+
+
+# fetch(etag) -> (status, data, etag) — как ApiClient._conditional_get
+CatalogFetch = Callable[[str | None], Awaitable[tuple[int, Any, str | None]]]
+
+
+def normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+
+_DERIVE: dict[str, Callable[[list[dict]], Any]] = {
+    # products: code -> id
+    "products": lambda rows: {normalize_code(p["code"]): p["id"] for p in rows if p.get("code") and p.get("id")},
+    # ingredients: id -> name
+    "ingredients": lambda rows: {int(i["id"]): i.get("name", f"#{i['id']}") for i in rows if i.get("id")},
+}
+
+
+@dataclass
+class _CatalogEntry:
+    data: list[dict]
+    derived: Any
+    etag: str | None
+    fetched_at: float
 
 
 class CacheStore:
     def __init__(self) -> None:
         self._data: dict[str, Any] = {}
         self._expires: dict[str, float] = {}
+        self._catalog: dict[str, _CatalogEntry] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+        # hit — свежий кеш, stale — отдали старое + фоновая перепроверка, miss — ждали загрузку;
+        # not_modified/changed — итоги перепроверок (304/200)
+        self.stats = {"hit": 0, "stale": 0, "miss": 0, "not_modified": 0, "changed": 0, "error": 0}
 
     # ── internal ──────────────────────────────────────────────────────────────
 
@@ -36,48 +73,68 @@ class CacheStore:
             self._data.pop(k, None)
             self._expires.pop(k, None)
 
-    # ── products ──────────────────────────────────────────────────────────────
-
-    def get_products_list(self) -> list[dict] | None:
-        return self._get("products_list")
-
-    def set_products_list(self, products: list[dict]) -> None:
-        self._set("products_list", products, ttl=PRODUCTS_TTL)
-        self._set("products_code_map", {
-            (p.get("code") or "").upper(): p["id"]
-            for p in products
-            if p.get("code") and p.get("id")
-        }, ttl=PRODUCTS_TTL)
-
-    def get_product_id_by_code(self, code: str) -> int | None:
-        m = self._get("products_code_map")
-        if m is None:
+    # ── catalogs (products / ingredients) ───────────────────────────────────────
+    #
+    # свежая запись (моложе ttl) — отдаём без запроса;
+    # протухшая, но не старше CATALOG_MAX_STALE — отдаём сразу и перепроверяем в фоне (If-None-Match);
+    # иначе — ждём загрузку. На 304 тело не качается, просто продлеваем запись.
+
+    async def catalog(self, name: str, ttl: float, fetch: CatalogFetch) -> tuple[Any, Any] | None:
+        """Возвращает (список, производная структура) или None, если загрузить не удалось."""
+        entry = self._catalog.get(name)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < ttl:
+                self.stats["hit"] += 1
+                return entry.data, entry.derived
+            if age < ttl + CATALOG_MAX_STALE:
+                self.stats["stale"] += 1
+                self._refresh_in_background(name, fetch)
+                return entry.data, entry.derived
+        self.stats["miss"] += 1
+        entry = await self._revalidate(name, fetch)
+        return (entry.data, entry.derived) if entry else None
+
+    def _refresh_in_background(self, name: str, fetch: CatalogFetch) -> None:
+        if name in self._refreshing:
+            return
+        task = asyncio.create_task(self._revalidate(name, fetch))
+        self._refreshing[name] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(name, None))
+
+    async def _revalidate(self, name: str, fetch: CatalogFetch) -> _CatalogEntry | None:
+        entry = self._catalog.get(name)
+        try:
+            s, data, etag = await fetch(entry.etag if entry else None)
+        except Exception as e:
+            log.warning("catalog %s refresh failed: %s", name, e)
+            self.stats["error"] += 1
+            return entry
+
+        if s == 304 and entry is not None:
+            self.stats["not_modified"] += 1
+            entry.fetched_at = time.monotonic()
+            return entry
+        if s == 200 and isinstance(data, list):
+            self.stats["changed"] += 1
+            entry = _CatalogEntry(data, _DERIVE[name](data), etag, time.monotonic())
+            self._catalog[name] = entry
+            return entry
+
+        log.warning("catalog %s refresh returned status=%s", name, s)
+        self.stats["error"] += 1
+        return entry
+
+    # ── per-user last opened receipt ──────────────────────────────────────────
+
+    def get_receipt_full(self, user_id: int, receipt_id: int) -> tuple[str, dict] | None:
+        v = self._get(f"rfull:{user_id}")
+        if v is None or v[0] != receipt_id:
             return None
-        return m.get(code.strip().upper())
-
-    def has_products(self) -> bool:
-        return self._has("products_list")
-
-    def invalidate_products(self) -> None:
-        self._pop("products_list", "products_code_map")
-
-    # ── ingredients ───────────────────────────────────────────────────────────
+        return v[1], v[2]
 
-    def get_ingredients_map(self) -> dict[int, str] | None:
-        return self._get("ingredients_map")
-
-    def set_ingredients(self, ingredients: list[dict]) -> None:
-        self._set("ingredients_map", {
-            int(i["id"]): i.get("name", f"#{i['id']}")
-            for i in ingredients
-            if i.get("id")
-        }, ttl=INGREDIENTS_TTL)
-
-    def has_ingredients(self) -> bool:
-        return self._has("ingredients_map")
-
-    def invalidate_ingredients(self) -> None:
-        self._pop("ingredients_map")
+    def set_receipt_full(self, user_id: int, receipt_id: int, etag: str, payload: dict) -> None:
+        self._set(f"rfull:{user_id}", (receipt_id, etag, payload), ttl=RECEIPT_FULL_TTL)
 
     # ── per-user receipts filter ─────────────
 
@@ -86,9 +143,19 @@ class CacheStore:
 
     def set_receipts_filter(self, user_id: int, flt: str) -> None:
         self._data[f"rf:{user_id}"] = flt
+        # курсоры страниц зависят от фильтра
+        self._pop(f"rcur:{user_id}")
+
+    def get_receipts_cursors(self, user_id: int) -> list[str | None]:
+        """cursors[p] — курсор для запроса страницы p (для 0 — None)."""
+        return self._data.get(f"rcur:{user_id}") or [None]
+
+    def set_receipts_cursors(self, user_id: int, cursors: list[str | None]) -> None:
+        self._data[f"rcur:{user_id}"] = cursors
 
     # ── full invalidation ─────────────────────────────────────────────────────
 
     def clear(self) -> None:
         self._data.clear()
-        self._expires.clear()
\ No newline at end of file
+        self._expires.clear()
+        self._catalog.clear()
\ No newline at end of file
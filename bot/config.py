@@ -2,4 +2,9 @@ import os
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 API_BASE_URL = os.getenv("API_BASE_URL")
-TOKENS_PATH = os.getenv("TOKENS_PATH")
\ No newline at end of file
+TOKENS_PATH = os.getenv("TOKENS_PATH")
+
+# пул соединений ApiClient
+API_POOL_LIMIT = int(os.getenv("API_POOL_LIMIT", "50"))
+API_KEEPALIVE_TIMEOUT = float(os.getenv("API_KEEPALIVE_TIMEOUT", "60"))
+API_DNS_TTL = int(os.getenv("API_DNS_TTL", "300"))
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 
 from aiogram import Router, F
@@ -10,6 +9,7 @@ from api import ApiClient
 from cache import CacheStore
 from tokens import TokenStore
 from services import ReceiptService
+from ui.formatters import RECEIPTS_PAGE_SIZE
 from ui import (
     PROCESSING_TEXT, TIMEOUT_TEXT,
     fmt_receipt_page, fmt_receipts_list,
@@ -17,8 +17,9 @@ from ui import (
     upload_mode_kb, UPLOAD_MODE_TEXT,
 )
 
-POLL_TRIES = 25
-POLL_SLEEP = 1.4
+# сервер держит запрос, пока OCR не закончится (long-poll), поэтому без sleep-опроса
+WAIT_ROUNDS = 2
+WAIT_TIMEOUT = 20
 
 log = logging.getLogger(__name__)
 router = Router(name="receipts")
@@ -41,18 +42,26 @@ def setup(api: ApiClient, tokens: TokenStore, cache: CacheStore):
             return "Нет доступа", None
 
         flt = cache.get_receipts_filter(user_id)
-        api_status = "applied" if flt == "applied" else None
+        status = ["applied"] if flt == "applied" else None
+        status_ne = ["applied"] if flt == "not_applied" else None
 
-        s, receipts = await api.list_receipts(token, status=api_status)
-        if s != 200 or not isinstance(receipts, list):
+        # keyset: к странице p можно прийти только через p-1, курсоры копим по мере листания
+        cursors = cache.get_receipts_cursors(user_id)
+        page = max(0, min(page, len(cursors) - 1))
+
+        s, data = await api.list_receipts(
+            token, status=status, status_ne=status_ne, limit=RECEIPTS_PAGE_SIZE, cursor=cursors[page],
+        )
+        if s != 200 or not isinstance(data, dict):
             log.warning("list_receipts returned status=%s for uid=%s", s, user_id)
-            receipts = []
+            data = {"items": [], "total": 0, "next_cursor": None}
 
-        if flt == "not_applied":
-            receipts = [r for r in receipts if r.get("status") != "applied"]
+        cursors = cursors[: page + 1]
+        if data.get("next_cursor"):
+            cursors.append(data["next_cursor"])
+        cache.set_receipts_cursors(user_id, cursors)
 
-        receipts.sort(key=lambda r: int(r.get("id", 0)), reverse=True)
-        text, p, pages, chunk = fmt_receipts_list(receipts, page)
+        text, p, pages, chunk = fmt_receipts_list(data["items"], page, data["total"])
         return text, receipts_list_kb(chunk, p, pages)
 
     # ── upload ────────────────────────────────────────────────────────────────
@@ -87,14 +96,13 @@ def setup(api: ApiClient, tokens: TokenStore, cache: CacheStore):
             buf = await message.bot.download_file(file.file_path)
             await api.enqueue_ocr(token, receipt_id, buf.read(), "receipt.jpg", "image/jpeg")
 
-            for _ in range(POLL_TRIES):
-                await asyncio.sleep(POLL_SLEEP)
-                _, receipt = await api.get_receipt(token, receipt_id)
+            for _ in range(WAIT_ROUNDS):
+                _, receipt = await api.wait_receipt(token, receipt_id, WAIT_TIMEOUT)
                 if receipt["status"] == "failed":
                     await msg.edit_text("❌ OCR ошибка")
                     return
                 if receipt["status"] in ("parsed", "edited", "applied"):
-                    await svc.auto_match(token, receipt_id)
+                    # позиции уже сматчены воркером при разборе чека
                     text, kb = await _render_receipt(message.from_user.id, receipt_id)
                     await msg.edit_text(text, reply_markup=kb)
                     return
@@ -102,7 +110,7 @@ def setup(api: ApiClient, tokens: TokenStore, cache: CacheStore):
             await msg.edit_text(TIMEOUT_TEXT)
 
         except Exception as e:
-            log.error("OCR polling failed for uid=%s: %s", message.from_user.id, e, exc_info=True)
+            log.error("OCR wait failed for uid=%s: %s", message.from_user.id, e, exc_info=True)
             await msg.edit_text("❌ Ошибка при обработке чека. Попробуй ещё раз.")
 
     # ── view / page ───────────────────────────────────────────────────────────
@@ -36,7 +36,8 @@ async def main():
 
     dp = Dispatcher(storage=MemoryStorage())
 
-    dp.update.middleware(RoleMiddleware(token_store, api_client))
+    role_mw = RoleMiddleware(token_store, api_client)
+    dp.update.middleware(role_mw)
     dp.update.middleware(ErrorMiddleware())
 
     dp.include_routers(
@@ -49,7 +50,13 @@ async def main():
 
     bot = Bot(BOT_TOKEN)
     log.info("Bot started")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        log.info("API stats: %s", api_client.stats_summary())
+        log.info("Role cache: %s", role_mw.stats)
+        log.info("Catalog cache: %s", cache_store.stats)
+        await api_client.close()
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import logging
+import time
 from typing import Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware
@@ -7,10 +8,43 @@ from aiogram.types import TelegramObject
 
 log = logging.getLogger(__name__)
 
+# роль меняется редко; минута устаревания для меню не критична (права всё равно проверяет API)
+ROLE_TTL = 60
+
+
 class RoleMiddleware(BaseMiddleware):
     def __init__(self, token_store, api_client):
         self.token_store = token_store
         self.api = api_client
+        # tg_user_id -> (token, role, expires_at); смена токена = промах
+        self._roles: dict[int, tuple[str, str | None, float]] = {}
+        self.stats = {"hits": 0, "misses": 0}
+        # любой 401/403 от API (не только /me) сбрасывает роль — понижение/отзыв видны сразу
+        api_client.on_auth_error(self.invalidate_token)
+
+    def invalidate(self, tg_user_id: int) -> None:
+        self._roles.pop(tg_user_id, None)
+
+    def invalidate_token(self, token: str) -> None:
+        for tg_user_id in [u for u, (t, _, _) in self._roles.items() if t == token]:
+            self._roles.pop(tg_user_id, None)
+
+    async def _resolve_role(self, tg_user_id: int, token: str) -> str | None:
+        now = time.monotonic()
+        cached = self._roles.get(tg_user_id)
+        if cached and cached[0] == token and cached[2] > now:
+            self.stats["hits"] += 1
+            return cached[1]
+
+        self.stats["misses"] += 1
+        s, me = await self.api.me(token)
+        if s in (401, 403):
+            return None
+
+        role = me.get("role") if isinstance(me, dict) else None
+        if s == 200:
+            self._roles[tg_user_id] = (token, role, now + ROLE_TTL)
+        return role
 
     async def __call__(self, handler, event: TelegramObject, data: dict):
         tg_user = data.get("event_from_user")
@@ -18,8 +52,7 @@ class RoleMiddleware(BaseMiddleware):
             token = self.token_store.get(tg_user.id)
             role = None
             if token:
-                s, me = await self.api.me(token)
-                role = me.get("role")
+                role = await self._resolve_role(tg_user.id, token)
             data["role"] = role
         return await handler(event, data)
 
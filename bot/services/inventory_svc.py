@@ -2,7 +2,7 @@ from __future__ import annotations
 from math import ceil
 
 from api import ApiClient
-from cache import CacheStore
+from cache import INGREDIENTS_TTL, CacheStore
 from tokens import TokenStore
 
 
@@ -13,16 +13,14 @@ class InventoryService:
         self.cache = cache
 
     async def get_ingredient_name(self, token: str, ingredient_id: int) -> str:
-        if not self.cache.has_ingredients():
-            await self._load_ingredients(token)
-        m = self.cache.get_ingredients_map() or {}
+        m = await self._load_ingredients(token)
         return m.get(ingredient_id, f"#{ingredient_id}")
 
     async def _load_ingredients(self, token: str) -> dict[int, str]:
-        s, items = await self.api.list_ingredients(token)
-        if s == 200 and isinstance(items, list):
-            self.cache.set_ingredients(items)
-        return self.cache.get_ingredients_map() or {}
+        cached = await self.cache.catalog(
+            "ingredients", INGREDIENTS_TTL, lambda etag: self.api.list_ingredients(token, etag),
+        )
+        return cached[1] if cached else {}
 
     async def build_view(self, token: str) -> list[dict]:
         """Возвращает список позиций склада с вычисленными лейблами срочности."""
@@ -1,9 +1,8 @@
 from __future__ import annotations
-import asyncio
 import logging
 
 from api import ApiClient
-from cache import CacheStore
+from cache import PRODUCTS_TTL, CacheStore, normalize_code
 from tokens import TokenStore
 
 log = logging.getLogger(__name__)
@@ -19,54 +18,36 @@ class ReceiptService:
         token = self.tokens.get(user_id)
         if not token:
             return None, []
-        _, receipt = await self.api.get_receipt(token, receipt_id)
-        _, items = await self.api.list_items(token, receipt_id)
-        if not isinstance(items, list):
-            items = []
-        items = [it for it in items if not it.get("is_deleted")]
-        return receipt, items
+        # один запрос вместо get_receipt + list_items; удалённые позиции сервер уже отфильтровал
+        cached = self.cache.get_receipt_full(user_id, receipt_id)
+        s, data, etag = await self.api.get_receipt_full(token, receipt_id, cached[0] if cached else None)
+        if s == 304 and cached:
+            data = cached[1]
+        elif s == 200 and isinstance(data, dict):
+            if etag:
+                self.cache.set_receipt_full(user_id, receipt_id, etag, data)
+        else:
+            log.warning("get_receipt_full returned status=%s for receipt=%s", s, receipt_id)
+            return None, []
+        return data["receipt"], data.get("items") or []
 
     async def get_products(self, token: str) -> list[dict]:
-        if self.cache.has_products():
-            return self.cache.get_products_list()  # type: ignore[return-value]
-        s, products = await self.api.list_products(token)
-        if s == 200 and isinstance(products, list):
-            self.cache.set_products_list(products)
-            return products
-        log.warning("list_products returned status=%s", s)
-        return []
+        cached = await self.cache.catalog(
+            "products", PRODUCTS_TTL, lambda etag: self.api.list_products(token, etag),
+        )
+        return cached[0] if cached else []
 
     async def get_product_id_by_code(self, token: str, code: str) -> int | None:
-        if not self.cache.has_products():
-            await self.get_products(token)
-        return self.cache.get_product_id_by_code(code)
+        cached = await self.cache.catalog(
+            "products", PRODUCTS_TTL, lambda etag: self.api.list_products(token, etag),
+        )
+        return cached[1].get(normalize_code(code)) if cached else None
 
     async def auto_match(self, token: str, receipt_id: int) -> None:
-        products = await self.get_products(token)
-        code_to_id = {
-            (p.get("code") or "").upper(): p["id"]
-            for p in products
-            if p.get("code") and p.get("id")
-        }
-
-        s, items = await self.api.list_items(token, receipt_id)
-        if s != 200 or not isinstance(items, list):
-            return
-
-        tasks = []
-        for it in items:
-            if it.get("product_id"):
-                continue
-            raw_code = (it.get("product_code_raw") or "").strip().upper()
-            product_id = code_to_id.get(raw_code)
-            if not product_id:
-                continue
-            tasks.append(
-                self.api.match_item(token, receipt_id, it["id"], {"product_id": product_id})
-            )
-
-        if tasks:
-            await asyncio.gather(*tasks)
+        # сервер матчит все позиции по коду товара одним UPDATE
+        s, _ = await self.api.auto_match(token, receipt_id)
+        if s != 200:
+            log.warning("auto_match returned status=%s for receipt=%s", s, receipt_id)
 
     @staticmethod
     def has_unmatched(items: list[dict]) -> bool:
@@ -51,12 +51,12 @@ def fmt_receipt_page(
 
 
 def fmt_receipts_list(
-    receipts: list[dict], page: int
+    receipts: list[dict], page: int, total: int
 ) -> tuple[str, int, int, list[dict]]:
-    pages = total_pages(len(receipts), RECEIPTS_PAGE_SIZE)
+    # receipts — уже одна страница с сервера
+    pages = total_pages(total, RECEIPTS_PAGE_SIZE)
     page = clamp_page(page, pages)
-    start = page * RECEIPTS_PAGE_SIZE
-    chunk = receipts[start : start + RECEIPTS_PAGE_SIZE]
+    chunk = receipts
 
     lines = ["🧾 Чеки", ""]
     if not receipts:
@@ -69,7 +69,7 @@ def fmt_receipts_list(
             created = created[:19].replace("T", " ")
         lines.append(f"#{r.get('id')} | {r.get('status', '—')} | {created}")
 
-    lines += ["", f"Стр. {page+1}/{pages} (всего: {len(receipts)})"]
+    lines += ["", f"Стр. {page+1}/{pages} (всего: {total})"]
     return "\n".join(lines), page, pages, chunk
 
 